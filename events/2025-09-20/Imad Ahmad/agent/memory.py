@@ -1,10 +1,26 @@
-from typing import List, Dict, Any
-from services.openai_client import OpenAIClient
+from typing import List, Dict, Any, Optional
+from services.openai_client import get_openai_client
 from observability.logger import setup_logger
 import json
+import re
 
 logger = setup_logger()
 
+# Compressed memo size (chars) above which it is re-summarized by the reflector
+MEMO_MAX_CHARS = 8000
+
+# Preference keywords, matched against the set of word tokens in each user turn
+_TOKEN_RE = re.compile(r"[a-z]+")
+_BUDGET_CHEAP = frozenset({'cheap', 'budget'})
+_BUDGET_LUX = frozenset({'expensive', 'luxury'})
+_ACTIVITY_KEYWORDS = (
+    ('cultural', frozenset({'museum', 'culture', 'history'})),
+    ('beach', frozenset({'beach', 'water', 'swim'})),
+    ('adventure', frozenset({'adventure', 'hiking', 'outdoor'})),
+    ('dining', frozenset({'food', 'restaurant', 'dining'})),
+)
+_PREF_KEYWORDS = _BUDGET_CHEAP.union(_BUDGET_LUX, *(keywords for _, keywords in _ACTIVITY_KEYWORDS))
+
 
 class ConversationMemory:
     """Manages conversation context with compression and summarization."""
@@ -13,7 +29,12 @@ class ConversationMemory:
         self.max_turns = max_turns
         self.conversation_history: List[Dict[str, Any]] = []
         self.compressed_memo: str = ""
-        self.openai_client = OpenAIClient()
+        self._last_compressed_index: int = 0  # Total turns ever compressed
+        self._context_cache: Optional[str] = None
+        self._dirty = True
+        self._preferences: Dict[str, Any] = {}
+        self._pref_scan_idx: int = 0  # Turns of conversation_history already scanned
+        self.openai_client = get_openai_client()
     
     def add_turn(self, user_input: str, assistant_response: str, metadata: Dict[str, Any] = None):
         """Add a conversation turn to memory."""
@@ -25,88 +46,127 @@ class ConversationMemory:
         }
         
         self.conversation_history.append(turn)
+        self._dirty = True
         
         # Compress if we exceed max turns
         if len(self.conversation_history) > self.max_turns:
             self._compress_history()
     
     def _compress_history(self):
-        """Compress older conversation history into a memo."""
+        """Compress newly evicted conversation turns into the memo (append-only)."""
         try:
-            # Take the oldest turns for compression
-            turns_to_compress = self.conversation_history[:-self.max_turns//2]
+            # Only the turns evicted since the last compaction; earlier ones already live in the memo
+            keep = self.max_turns // 2
+            cutoff = len(self.conversation_history) - keep
+            turns_to_compress = self.conversation_history[:cutoff]
             
             # Format for compression
-            history_text = ""
-            for turn in turns_to_compress:
-                history_text += f"User: {turn['user']}\n"
-                history_text += f"Assistant: {turn['assistant']}\n\n"
+            history_text = "".join(
+                f"User: {turn['user']}\nAssistant: {turn['assistant']}\n\n"
+                for turn in turns_to_compress
+            )
             
-            # Compress using OpenAI
-            new_memo = self.openai_client.compress_context(history_text)
+            # Compress only the delta, using the existing memo as a prior summary
+            new_memo = self.openai_client.compress_context(
+                history_text, prior_summary=self.compressed_memo
+            )
             
-            # Update memo and remove compressed turns
+            # Append the delta with a plain separator to keep the memo prefix stable
             if self.compressed_memo:
-                self.compressed_memo += f"\n\nAdditional context: {new_memo}"
+                self.compressed_memo += f"\n{new_memo}"
             else:
                 self.compressed_memo = new_memo
             
             # Keep only recent turns
-            self.conversation_history = self.conversation_history[-self.max_turns//2:]
+            self.conversation_history = self.conversation_history[cutoff:]
+            self._last_compressed_index += len(turns_to_compress)
+            self._dirty = True
+            self._reset_preferences()
             
             logger.info("Compressed conversation history", 
                        compressed_turns=len(turns_to_compress),
+                       total_compressed_turns=self._last_compressed_index,
                        remaining_turns=len(self.conversation_history))
             
+            if len(self.compressed_memo) > MEMO_MAX_CHARS:
+                self._reflect_memo()
+            
         except Exception as e:
             logger.error("Failed to compress conversation history", error=str(e))
     
+    def _reflect_memo(self):
+        """Re-summarize the memo itself once it outgrows MEMO_MAX_CHARS."""
+        try:
+            original_length = len(self.compressed_memo)
+            self.compressed_memo = self.openai_client.compress_context(
+                self.compressed_memo, reflect=True
+            )
+            self._dirty = True
+            logger.info("Reflected conversation memo",
+                       original_chars=original_length,
+                       reflected_chars=len(self.compressed_memo))
+        except Exception as e:
+            logger.error("Failed to reflect conversation memo", error=str(e))
+    
     def get_context(self) -> str:
         """Get the current conversation context."""
-        context = ""
+        if not self.compressed_memo and not self.conversation_history:
+            return ""
+        
+        if not self._dirty and self._context_cache is not None:
+            return self._context_cache
+        
+        parts = []
         
         # Add compressed memo if available
         if self.compressed_memo:
-            context += f"Previous conversation summary: {self.compressed_memo}\n\n"
+            parts.append(f"Previous conversation summary: {self.compressed_memo}\n\n")
         
         # Add recent conversation history
         if self.conversation_history:
-            context += "Recent conversation:\n"
+            parts.append("Recent conversation:\n")
             for turn in self.conversation_history[-3:]:  # Last 3 turns
-                context += f"User: {turn['user']}\n"
-                context += f"Assistant: {turn['assistant']}\n\n"
+                parts.append(f"User: {turn['user']}\nAssistant: {turn['assistant']}\n\n")
         
-        return context.strip()
+        self._context_cache = "".join(parts).strip()
+        self._dirty = False
+        return self._context_cache
     
     def clear(self):
         """Clear all conversation memory."""
         self.conversation_history = []
         self.compressed_memo = ""
+        self._last_compressed_index = 0
+        self._dirty = True
+        self._reset_preferences()
         logger.info("Cleared conversation memory")
     
+    def _reset_preferences(self):
+        """Drop cached preferences so they are rescanned from the current history."""
+        self._preferences = {}
+        self._pref_scan_idx = 0
+    
     def get_preferences(self) -> Dict[str, Any]:
         """Extract user preferences from conversation history."""
-        preferences = {}
+        preferences = self._preferences
         
-        # Look through conversation for preference indicators
-        for turn in self.conversation_history:
-            user_input = turn['user'].lower()
+        # Only scan turns added since the last call
+        for turn in self.conversation_history[self._pref_scan_idx:]:
+            # Keep only keyword tokens, so long messages don't build a set of every word
+            tokens = _PREF_KEYWORDS.intersection(_TOKEN_RE.findall(turn['user'].lower()))
             
             # Budget preferences
-            if 'budget' in user_input or 'cheap' in user_input or 'expensive' in user_input:
-                if 'cheap' in user_input or 'budget' in user_input:
-                    preferences['budget_preference'] = 'budget-friendly'
-                elif 'expensive' in user_input or 'luxury' in user_input:
-                    preferences['budget_preference'] = 'luxury'
+            if tokens & _BUDGET_CHEAP:
+                preferences['budget_preference'] = 'budget-friendly'
+            elif tokens & _BUDGET_LUX:
+                preferences['budget_preference'] = 'luxury'
             
             # Activity preferences
-            if any(word in user_input for word in ['museum', 'culture', 'history']):
-                preferences.setdefault('activity_types', []).append('cultural')
-            if any(word in user_input for word in ['beach', 'water', 'swim']):
-                preferences.setdefault('activity_types', []).append('beach')
-            if any(word in user_input for word in ['adventure', 'hiking', 'outdoor']):
-                preferences.setdefault('activity_types', []).append('adventure')
-            if any(word in user_input for word in ['food', 'restaurant', 'dining']):
-                preferences.setdefault('activity_types', []).append('dining')
+            for activity_type, keywords in _ACTIVITY_KEYWORDS:
+                if tokens & keywords:
+                    preferences.setdefault('activity_types', []).append(activity_type)
+        
+        self._pref_scan_idx = len(self.conversation_history)
         
-        return preferences
+        return {key: list(value) if isinstance(value, list) else value
+                for key, value in preferences.items()}
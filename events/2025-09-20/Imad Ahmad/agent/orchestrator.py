@@ -1,5 +1,13 @@
+import copy
+import heapq
 import json
+import re
+import threading
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from operator import attrgetter
 from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 
@@ -7,19 +15,63 @@ from agent.schemas import TravelRequest, ItineraryPlan, ItineraryItem
 from agent.tools import search_tool, calculator_tool, currency_tool
 from agent.memory import ConversationMemory
 from agent.reliability import fallback_manager
-from services.openai_client import OpenAIClient
-from services.serper_client import SerperClient
+from services.openai_client import get_openai_client
+from services.serper_client import get_serper_client
 from observability.logger import setup_logger, log_trace
 
 logger = setup_logger()
 
+# Upper bound on concurrent search requests issued per planning run
+SEARCH_MAX_WORKERS = 8
+
+# Pricing-focused search queries, formatted with the request's destination and currency
+_QUERY_TEMPLATES = (
+    "{destination} hotel prices {currency}",
+    "{destination} attraction tickets cost price",
+    "{destination} restaurant meal prices",
+    "{destination} activities cost booking price",
+    "{destination} desert safari price cost",
+    "{destination} museum entry fee price",
+    "{destination} transport taxi metro cost",
+)
+# Extra queries only issued for Dubai trips
+_DUBAI_QUERY_TEMPLATES = (
+    "Dubai Mall Burj Khalifa ticket price cost",
+)
+
+# Price indicators that mark a search result as pricing-relevant
+_PRICE_RE = re.compile(r'price|cost|\$|€|£|aed|usd|eur|gbp|ticket|booking|from|starting|fee|charge')
+# Patterns that signal explicit pricing; a result's rank is the number of distinct patterns present
+_CLEAR_PRICE_RE = re.compile(r'\$|aed|usd|price:|cost:|from |starting at')
+
+# Sort keys for itinerary items
+_COST = attrgetter('approx_cost')
+_DAY_COST = attrgetter('day', 'approx_cost')
+
+
+# Parsed Dubai fallback data; set only after a successful load, so a missing or
+# unreadable file is retried on the next fallback
+_fallback_dubai: Optional[Dict[str, Any]] = None
+
+
+def _load_fallback_dubai() -> Optional[Dict[str, Any]]:
+    """Return a private copy of the curated Dubai fallback data; None if the file is missing."""
+    global _fallback_dubai
+    if _fallback_dubai is None:
+        fallback_path = Path("data/fallback_dubai.json")
+        if not fallback_path.exists():
+            return None
+        with open(fallback_path, 'r') as f:
+            _fallback_dubai = json.load(f)
+    return copy.deepcopy(_fallback_dubai)
+
 
 class TravelOrchestrator:
     """Main agent orchestrator that manages the travel planning workflow."""
     
     def __init__(self):
-        self.openai_client = OpenAIClient()
-        self.serper_client = SerperClient()
+        self.openai_client = get_openai_client()
+        self.serper_client = get_serper_client()
         self.memory = ConversationMemory()
         self.request_id = None
         
@@ -84,55 +136,54 @@ class TravelOrchestrator:
     
     def _search_phase(self, request: TravelRequest) -> list:
         """Search for travel information using multiple queries focused on pricing."""
-        search_results = []
-        
         # Define more specific search queries for pricing
-        queries = [
-            f"{request.destination} hotel prices {request.budget_currency}",
-            f"{request.destination} attraction tickets cost price",
-            f"{request.destination} restaurant meal prices",
-            f"{request.destination} activities cost booking price",
-            f"Dubai Mall Burj Khalifa ticket price cost",
-            f"{request.destination} desert safari price cost",
-            f"{request.destination} museum entry fee price",
-            f"{request.destination} transport taxi metro cost"
-        ]
+        templates = _QUERY_TEMPLATES
+        if "dubai" in request.destination.lower():
+            templates += _DUBAI_QUERY_TEMPLATES
         
-        for query in queries:
-            try:
-                results = search_tool(query)
-                # Filter results that likely contain pricing information
-                price_relevant_results = []
-                for result in results:
-                    snippet = result.get('snippet', '').lower()
-                    title = result.get('title', '').lower()
-                    # Look for price indicators in snippets and titles
-                    price_indicators = ['price', 'cost', '$', '€', '£', 'aed', 'usd', 'eur', 'gbp', 
-                                      'ticket', 'booking', 'from', 'starting', 'fee', 'charge']
-                    if any(indicator in snippet or indicator in title for indicator in price_indicators):
-                        price_relevant_results.append(result)
-                
-                search_results.extend(price_relevant_results)
-                logger.info("Search completed", query=query, results_count=len(price_relevant_results), request_id=self.request_id)
-            except Exception as e:
-                logger.warning("Search query failed", query=query, error=str(e), request_id=self.request_id)
-                continue
+        params = {"destination": request.destination, "currency": request.budget_currency}
+        queries = [template.format_map(params) for template in templates]
         
-        # Remove duplicates based on URL and prioritize results with pricing info
-        unique_results = []
+        # Workers share one set of seen URLs, so duplicates from overlapping queries are
+        # skipped before the price filter runs
         seen_urls = set()
-        for result in search_results:
-            if result.get('url') not in seen_urls:
-                unique_results.append(result)
-                seen_urls.add(result.get('url'))
+        seen_lock = threading.Lock()
+        unique_results = deque()  # (result, lowercased text) pairs
+        
+        def run_query(query: str) -> int:
+            kept = 0
+            for result in search_tool(query):
+                url = result.get('url')
+                with seen_lock:
+                    if url in seen_urls:
+                        continue
+                    seen_urls.add(url)
+                
+                # Keep results that likely contain pricing information
+                text = (result.get('snippet', '') + ' ' + result.get('title', '')).lower()
+                if _PRICE_RE.search(text):
+                    unique_results.append((result, text))
+                    kept += 1
+            return kept
+        
+        # Queries are I/O bound, so issue them concurrently
+        with ThreadPoolExecutor(max_workers=min(SEARCH_MAX_WORKERS, len(queries))) as executor:
+            futures = {executor.submit(run_query, query): query for query in queries}
+            for future in as_completed(futures):
+                query = futures[future]
+                try:
+                    results_count = future.result()
+                    logger.info("Search completed", query=query, results_count=results_count, request_id=self.request_id)
+                except Exception as e:
+                    logger.warning("Search query failed", query=query, error=str(e), request_id=self.request_id)
+                    continue
         
         # Sort by relevance (prioritize results with clear pricing information)
-        def has_clear_pricing(result):
-            text = (result.get('snippet', '') + ' ' + result.get('title', '')).lower()
-            price_patterns = ['$', 'aed', 'usd', 'price:', 'cost:', 'from ', 'starting at']
-            return sum(1 for pattern in price_patterns if pattern in text)
+        def has_clear_pricing(entry):
+            return len(set(_CLEAR_PRICE_RE.findall(entry[1])))
         
-        unique_results.sort(key=has_clear_pricing, reverse=True)
+        # Increased limit for better pricing data; nlargest avoids sorting the full list
+        top_results = heapq.nlargest(20, unique_results, key=has_clear_pricing)
         
         log_trace(logger, self.request_id, "search_phase_completed", {
             "total_results": len(unique_results),
@@ -140,7 +191,7 @@ class TravelOrchestrator:
             "price_relevant_results": len([r for r in unique_results if has_clear_pricing(r) > 0])
         })
         
-        return unique_results[:20]  # Increased limit for better pricing data
+        return [result for result, _ in top_results]
     
     def _synthesis_phase(self, request: TravelRequest, search_results: list) -> ItineraryPlan:
         """Generate itinerary using OpenAI with search results."""
@@ -180,17 +231,14 @@ class TravelOrchestrator:
             issues.append(f"Over budget: {itinerary.total_estimated_cost} > {budget_limit}")
         
         # Check source confidence (need at least 2 unique sources)
-        unique_sources = set()
-        for item in itinerary.items:
-            if item.source:
-                unique_sources.add(item.source)
+        unique_sources = {item.source for item in itinerary.items if item.source}
         
         if len(unique_sources) < 2:
             needs_review = True
             issues.append(f"Low confidence: only {len(unique_sources)} unique sources")
         
         # Check if all days are covered
-        covered_days = set(item.day for item in itinerary.items)
+        covered_days = {item.day for item in itinerary.items}
         expected_days = set(range(1, request.days + 1))
         if covered_days != expected_days:
             needs_review = True
@@ -210,11 +258,11 @@ class TravelOrchestrator:
         logger.info("Using search fallback", query=query, request_id=self.request_id)
         
         # Load fallback data if available
-        fallback_path = Path("data/fallback_dubai.json")
-        if fallback_path.exists() and "dubai" in query.lower():
+        if "dubai" in query.lower():
             try:
-                with open(fallback_path, 'r') as f:
-                    fallback_data = json.load(f)
+                fallback_data = _load_fallback_dubai()
+                if fallback_data is None:
+                    return []
                 
                 # Convert to search result format
                 results = []
@@ -249,12 +297,15 @@ class TravelOrchestrator:
         logger.info("Using synthesis fallback", request_id=self.request_id)
         
         # Load fallback data
-        fallback_path = Path("data/fallback_dubai.json")
-        if fallback_path.exists() and "dubai" in request.destination.lower():
+        fallback_data = None
+        if "dubai" in request.destination.lower():
+            try:
+                fallback_data = _load_fallback_dubai()
+            except Exception as e:
+                logger.error("Failed to load fallback data", error=str(e))
+        
+        if fallback_data is not None:
             try:
-                with open(fallback_path, 'r') as f:
-                    fallback_data = json.load(f)
-                
                 # Convert to itinerary format
                 items = []
                 total_cost = 0
@@ -323,7 +374,7 @@ class TravelOrchestrator:
         
         elif action == "reduce":
             # Auto-reduce costs while maintaining activities across all days
-            original_days = set(item.day for item in itinerary.items)
+            original_days = {item.day for item in itinerary.items}
             budget_limit = itinerary.total_estimated_cost * 0.95  # Target 95% of original budget
             
             # Group items by day
@@ -339,28 +390,25 @@ class TravelOrchestrator:
             # Ensure at least one activity per day, prioritizing cheaper options
             for day in sorted(original_days):
                 if day in items_by_day:
-                    day_items = sorted(items_by_day[day], key=lambda x: x.approx_cost)
+                    day_items = sorted(items_by_day[day], key=_COST)
                     # Always include the cheapest activity for each day
                     if day_items:
                         cheapest = day_items[0]
                         reduced_items.append(cheapest)
                         total_cost += cheapest.approx_cost
-                        day_items.remove(cheapest)
-                        items_by_day[day] = day_items
+                        items_by_day[day] = day_items[1:]
             
             # Add remaining items if budget allows, maintaining day distribution
-            remaining_items = []
-            for day_items in items_by_day.values():
-                remaining_items.extend(day_items)
+            remaining_items = chain.from_iterable(items_by_day.values())
             
             # Sort remaining items by cost and add if budget allows
-            for item in sorted(remaining_items, key=lambda x: x.approx_cost):
+            for item in sorted(remaining_items, key=_COST):
                 if total_cost + item.approx_cost <= budget_limit:
                     reduced_items.append(item)
                     total_cost += item.approx_cost
             
             # If we still don't have enough activities per day, add free activities
-            final_days = set(item.day for item in reduced_items)
+            final_days = {item.day for item in reduced_items}
             missing_days = original_days - final_days
             
             for day in missing_days:
@@ -374,7 +422,7 @@ class TravelOrchestrator:
                 )
                 reduced_items.append(free_activity)
             
-            itinerary.items = sorted(reduced_items, key=lambda x: (x.day, x.approx_cost))
+            itinerary.items = sorted(reduced_items, key=_DAY_COST)
             itinerary.total_estimated_cost = total_cost
             itinerary.under_budget = True
             itinerary.notes += " [Auto-reduced to fit budget while maintaining daily activities]"
@@ -383,7 +431,7 @@ class TravelOrchestrator:
                 "action": action,
                 "final_cost": total_cost,
                 "items_removed": len(itinerary.items) - len(reduced_items),
-                "days_covered": len(set(item.day for item in reduced_items))
+                "days_covered": len({item.day for item in reduced_items})
             })
         
         return itinerary
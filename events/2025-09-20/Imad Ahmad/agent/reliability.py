@@ -1,10 +1,22 @@
 import time
 import asyncio
+import contextvars
+import functools
 from typing import Callable, Any, Dict, Optional
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type, retry_if_not_exception_type
 import threading
-import random
+
+# Shared worker pool used to enforce call timeouts. At most TIMEOUT_WORKERS decorated calls
+# run at once; further calls queue, and time spent queued counts against their timeout.
+# A timed-out call keeps its worker until it returns, so the wrapped functions must pass
+# their own timeout to the HTTP client to bound how long a worker can stay occupied.
+TIMEOUT_WORKERS = 16
+_TIMEOUT_EXECUTOR = ThreadPoolExecutor(max_workers=TIMEOUT_WORKERS, thread_name_prefix="reliability-timeout")
+
+
+class CallTimeoutError(TimeoutError):
+    """Raised when a call wrapped by with_timeout_and_retry exceeds its timeout."""
 
 
 class CircuitBreaker:
@@ -16,33 +28,47 @@ class CircuitBreaker:
         self.expected_exception = expected_exception
         
         self.failure_count = 0
-        self.last_failure_time = None
+        self.last_failure_time: float = 0.0  # time.monotonic() of the last failure
         self.state = 'CLOSED'  # CLOSED, OPEN, HALF_OPEN
         self._lock = threading.Lock()
     
     def __call__(self, func: Callable) -> Callable:
         def wrapper(*args, **kwargs):
-            with self._lock:
-                if self.state == 'OPEN':
-                    if self._should_attempt_reset():
-                        self.state = 'HALF_OPEN'
-                    else:
-                        raise Exception(f"Circuit breaker is OPEN. Service unavailable.")
-                
-                try:
-                    result = func(*args, **kwargs)
-                    self._on_success()
-                    return result
-                except self.expected_exception as e:
-                    self._on_failure()
-                    raise e
+            # Only state checks and transitions hold the lock, so concurrent calls run in parallel
+            self._check_and_admit()
+            
+            try:
+                result = func(*args, **kwargs)
+            except self.expected_exception as e:
+                self._record_failure()
+                raise e
+            
+            self._record_success()
+            return result
         
         return wrapper
     
+    def _check_and_admit(self):
+        """Raise if the circuit is open; move to HALF_OPEN once the recovery timeout has passed."""
+        with self._lock:
+            if self.state == 'OPEN':
+                if self._should_attempt_reset():
+                    self.state = 'HALF_OPEN'
+                else:
+                    raise Exception(f"Circuit breaker is OPEN. Service unavailable.")
+    
+    def _record_success(self):
+        with self._lock:
+            self._on_success()
+    
+    def _record_failure(self):
+        with self._lock:
+            self._on_failure()
+    
     def _should_attempt_reset(self) -> bool:
         return (
             self.last_failure_time and 
-            datetime.now() - self.last_failure_time >= timedelta(seconds=self.recovery_timeout)
+            time.monotonic() - self.last_failure_time >= self.recovery_timeout
         )
     
     def _on_success(self):
@@ -51,7 +77,7 @@ class CircuitBreaker:
     
     def _on_failure(self):
         self.failure_count += 1
-        self.last_failure_time = datetime.now()
+        self.last_failure_time = time.monotonic()
         
         if self.failure_count >= self.failure_threshold:
             self.state = 'OPEN'
@@ -62,27 +88,22 @@ def with_timeout_and_retry(timeout_seconds: int = 5, max_attempts: int = 3):
     def decorator(func: Callable) -> Callable:
         @retry(
             stop=stop_after_attempt(max_attempts),
-            wait=wait_exponential(multiplier=1, min=1, max=10),
-            retry=retry_if_exception_type((Exception,))
+            wait=wait_random_exponential(multiplier=1, min=1, max=10),  # Jitter avoids thundering herd
+            # A timed-out call still holds its worker, so retrying it would tie up another one
+            retry=retry_if_exception_type((Exception,)) & retry_if_not_exception_type(CallTimeoutError)
         )
         def wrapper(*args, **kwargs):
-            # Add jitter to avoid thundering herd
-            if max_attempts > 1:
-                time.sleep(random.uniform(0, 0.1))
-            
-            # Simple timeout implementation
-            start_time = time.time()
+            # Run the call on a worker thread so the caller stops waiting once the timeout passes;
+            # the caller's contextvars (e.g. structlog context) are carried into the worker
+            ctx = contextvars.copy_context()
+            future = _TIMEOUT_EXECUTOR.submit(ctx.run, func, *args, **kwargs)
             try:
-                result = func(*args, **kwargs)
-                elapsed = time.time() - start_time
-                if elapsed > timeout_seconds:
-                    raise TimeoutError(f"Function {func.__name__} exceeded timeout of {timeout_seconds}s")
-                return result
-            except Exception as e:
-                elapsed = time.time() - start_time
-                if elapsed > timeout_seconds:
-                    raise TimeoutError(f"Function {func.__name__} exceeded timeout of {timeout_seconds}s")
-                raise e
+                return future.result(timeout=timeout_seconds)
+            except FuturesTimeoutError:
+                # Cancels the call if it is still queued; a running call finishes in the background,
+                # bounded by the timeout the wrapped function passes to its HTTP client
+                future.cancel()
+                raise CallTimeoutError(f"Function {func.__name__} exceeded timeout of {timeout_seconds}s")
         
         return wrapper
     return decorator
@@ -130,3 +151,15 @@ def reliable_service_call(service_name: str, timeout: int = 5, retries: int = 2)
         
         return wrapper
     return decorator
+
+
+def local_tool(service_name: str):
+    """Decorator for pure in-process tools: keeps the fallback but skips timeout/retry plumbing,
+    which cannot help a call that does no I/O."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return fallback_manager.execute_with_fallback(service_name, func, *args, **kwargs)
+        
+        return wrapper
+    return decorator
@@ -1,20 +1,71 @@
+import ast
 import json
-import sympy
-from typing import List, Dict, Any
-from services.serper_client import SerperClient
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+from services.serper_client import get_serper_client
 from agent.schemas import SearchResult
-from agent.reliability import reliable_service_call
-from observability.logger import setup_logger, log_tool_call, log_tool_result
+from agent.reliability import local_tool
+from observability.logger import setup_logger, log_tool_call, log_tool_result, new_request_id
+from types import MappingProxyType
+from decimal import Decimal, ROUND_HALF_UP
 import time
-import uuid
 
 logger = setup_logger()
 
+# Fixed exchange rates for demo predictability, keyed "FROM|TO"; inverse rates are derived exactly
+_BASE_RATES = {
+    ("USD", "AED"): Decimal("3.67"),
+    ("EUR", "USD"): Decimal("1.10"),
+    ("EUR", "AED"): Decimal("4.04"),
+    ("GBP", "USD"): Decimal("1.25"),
+    ("GBP", "AED"): Decimal("4.59"),
+}
+EXCHANGE_RATES = MappingProxyType({
+    **{f"{src}|{dst}": rate for (src, dst), rate in _BASE_RATES.items()},
+    **{f"{dst}|{src}": Decimal(1) / rate for (src, dst), rate in _BASE_RATES.items()},
+})
+_CENTS = Decimal("0.01")
+
+# sympy is slow to import, so it is only loaded once an expression needs it
+_sympy = None
+
+
+def _get_sympy():
+    global _sympy
+    if _sympy is None:
+        import sympy
+        _sympy = sympy
+    return _sympy
+
+
+# AST nodes allowed in the plain-arithmetic fast path of calculator_tool
+_ARITHMETIC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd,
+)
+
+
+@lru_cache(maxsize=1024)
+def _compile_arithmetic(expression: str) -> Optional[Any]:
+    """Compile a plain numeric expression once; None if it needs sympy (symbols, functions, ^)."""
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError:
+        return None
+    
+    for node in ast.walk(tree):
+        if not isinstance(node, _ARITHMETIC_NODES):
+            return None
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float):
+            return None
+    
+    return compile(tree, "<calculator>", "eval")
+
 
 def search_tool(query: str) -> List[Dict[str, Any]]:
     """Search for travel information using Serper API."""
     try:
-        serper_client = SerperClient()
+        serper_client = get_serper_client()
         results = serper_client.search(query, num_results=5)
         return [
             {
@@ -29,11 +80,11 @@ def search_tool(query: str) -> List[Dict[str, Any]]:
         return []
 
 
-@reliable_service_call("calculator", timeout=5, retries=1)
+@local_tool("calculator")
 def calculator_tool(expression: str) -> float:
     """Safely evaluate mathematical expression."""
-    request_id = str(uuid.uuid4())
-    start_time = time.time()
+    request_id = new_request_id()
+    start_ns = time.monotonic_ns()
     
     inputs = {"expression": expression}
     inputs_hash = log_tool_call(logger, "calculator", inputs, request_id)
@@ -42,64 +93,57 @@ def calculator_tool(expression: str) -> float:
         # Replace common operators that might be written in text
         expression = expression.replace("×", "*").replace("÷", "/")
         
-        # Use sympy to safely evaluate
-        result = float(sympy.sympify(expression, locals={}))
+        # Plain arithmetic runs as cached bytecode; anything else goes through sympy
+        code = _compile_arithmetic(expression.strip())
+        if code is not None:
+            result = float(eval(code, {"__builtins__": {}}, {}))
+        else:
+            result = float(_get_sympy().sympify(expression, locals={}))
         
-        duration_ms = int((time.time() - start_time) * 1000)
+        duration_ms = (time.monotonic_ns() - start_ns) // 1_000_000
         log_tool_result(logger, "calculator", inputs_hash, result, duration_ms, request_id, True)
         
         return result
         
-    except (sympy.SympifyError, ValueError, TypeError) as e:
-        duration_ms = int((time.time() - start_time) * 1000)
+    except (ValueError, TypeError, ArithmeticError) as e:  # sympy.SympifyError is a ValueError
+        duration_ms = (time.monotonic_ns() - start_ns) // 1_000_000
         log_tool_result(logger, "calculator", inputs_hash, str(e), duration_ms, request_id, False)
         raise ValueError(f"Invalid mathematical expression: {expression}")
 
 
-@reliable_service_call("currency", timeout=2, retries=1)
+@local_tool("currency")
 def currency_tool(amount: float, from_currency: str, to_currency: str) -> float:
     """Convert currency using fixed rates."""
-    request_id = str(uuid.uuid4())
-    start_time = time.time()
+    request_id = new_request_id()
+    start_ns = time.monotonic_ns()
     
     inputs = {"amount": amount, "from_currency": from_currency, "to_currency": to_currency}
     inputs_hash = log_tool_call(logger, "currency_conversion", inputs, request_id)
     
-    # Fixed exchange rates for demo predictability
-    EXCHANGE_RATES = {
-        ("USD", "AED"): 3.67,
-        ("AED", "USD"): 1/3.67,
-        ("EUR", "USD"): 1.10,
-        ("USD", "EUR"): 1/1.10,
-        ("EUR", "AED"): 4.04,
-        ("AED", "EUR"): 1/4.04,
-        ("GBP", "USD"): 1.25,
-        ("USD", "GBP"): 1/1.25,
-        ("GBP", "AED"): 4.59,
-        ("AED", "GBP"): 1/4.59,
-    }
-    
     try:
+        from_code = from_currency.upper()
+        to_code = to_currency.upper()
+        
+        # Decimal avoids binary-float drift; str() keeps the amount as the caller wrote it
+        result = Decimal(str(amount))
+        
         # Same currency, no conversion needed
-        if from_currency.upper() == to_currency.upper():
-            result = amount
-        else:
+        if from_code != to_code:
             # Look up exchange rate
-            rate_key = (from_currency.upper(), to_currency.upper())
-            if rate_key in EXCHANGE_RATES:
-                rate = EXCHANGE_RATES[rate_key]
-                result = amount * rate
+            rate = EXCHANGE_RATES.get(f"{from_code}|{to_code}")
+            if rate is not None:
+                result *= rate
             else:
                 # Default fallback rate (assume USD base)
                 logger.warning(f"No exchange rate found for {from_currency} to {to_currency}, using 1:1")
-                result = amount
         
-        duration_ms = int((time.time() - start_time) * 1000)
+        duration_ms = (time.monotonic_ns() - start_ns) // 1_000_000
         log_tool_result(logger, "currency_conversion", inputs_hash, result, duration_ms, request_id, True)
         
-        return round(result, 2)
+        # Round half up to cents, as expected for money (round() would use banker's rounding)
+        return float(result.quantize(_CENTS, rounding=ROUND_HALF_UP))
         
     except Exception as e:
-        duration_ms = int((time.time() - start_time) * 1000)
+        duration_ms = (time.monotonic_ns() - start_ns) // 1_000_000
         log_tool_result(logger, "currency_conversion", inputs_hash, str(e), duration_ms, request_id, False)
         raise e
@@ -4,6 +4,8 @@ import sys
 from pathlib import Path
 import time
 import json
+from collections import defaultdict, deque
+from itertools import islice
 from datetime import datetime
 
 # Add parent directory to path for imports
@@ -29,7 +31,7 @@ st.set_page_config(
 )
 
 # Custom CSS for windsurfer theme
-st.markdown("""
+_THEME_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #0ea5e9 0%, #06b6d4 100%);
@@ -90,10 +92,25 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+_HEADER_HTML = """
+<div class="main-header">
+    <h1>🌊 Travel Assistant</h1>
+    <p>Reliable Agent Demo - Building Reliable Workflows with LangChain</p>
+</div>
+"""
+
+@st.cache_resource
+def _inject_static_html():
+    """Render the theme CSS and page header; cached so reruns replay them instead of rebuilding."""
+    st.markdown(_THEME_CSS, unsafe_allow_html=True)
+    st.markdown(_HEADER_HTML, unsafe_allow_html=True)
 
 def initialize_session_state():
     """Initialize session state variables."""
+    _inject_static_html()
+    
     if 'orchestrator' not in st.session_state:
         st.session_state.orchestrator = TravelOrchestrator()
     
@@ -104,7 +121,7 @@ def initialize_session_state():
         st.session_state.needs_review = False
     
     if 'logs' not in st.session_state:
-        st.session_state.logs = []
+        st.session_state.logs = deque(maxlen=50)  # Keep only last 50 logs
     
     if 'simulate_failure' not in st.session_state:
         st.session_state.simulate_failure = False
@@ -114,18 +131,33 @@ def add_log(message: str, level: str = "INFO"):
     timestamp = datetime.now().strftime("%H:%M:%S")
     log_entry = f"[{timestamp}] {level}: {message}"
     st.session_state.logs.append(log_entry)
-    
-    # Keep only last 50 logs
-    if len(st.session_state.logs) > 50:
-        st.session_state.logs = st.session_state.logs[-50:]
 
 def display_logs():
     """Display the live log tail."""
     if st.session_state.logs:
-        log_text = "\n".join(st.session_state.logs[-10:])  # Show last 10 logs
+        logs = st.session_state.logs
+        log_text = "\n".join(islice(logs, max(len(logs) - 10, 0), None))  # Show last 10 logs
         st.markdown(f'<div class="log-container">{log_text}</div>', unsafe_allow_html=True)
 
-def display_itinerary(plan: ItineraryPlan):
+def _group_by_day(items) -> dict:
+    """Group itinerary items by day number."""
+    activities_by_day = defaultdict(list)
+    for item in items:
+        activities_by_day[item.day].append(item)
+    return activities_by_day
+
+def _activity_card_html(activity) -> str:
+    """Render a single activity card."""
+    source_link = f" [🔗 Source]({activity.source})" if activity.source else ""
+    cost_display = f"{activity.approx_cost:.2f} {activity.currency}" if activity.approx_cost > 0 else "Free"
+    return (
+        f'<div class="activity-card">'
+        f'<h4>{activity.activity}</h4>'
+        f'<p><strong>Cost:</strong> {cost_display}{source_link}</p>'
+        f'</div>\n'
+    )
+
+def display_itinerary(plan: ItineraryPlan, activities_by_day: dict):
     """Display the itinerary in a card grid format."""
     st.markdown('<div class="wave-divider"></div>', unsafe_allow_html=True)
     
@@ -150,27 +182,11 @@ def display_itinerary(plan: ItineraryPlan):
         st.metric("Budget Used", f"{progress:.1%}")
         st.progress(progress)
     
-    # Group activities by day
-    activities_by_day = {}
-    for item in plan.items:
-        if item.day not in activities_by_day:
-            activities_by_day[item.day] = []
-        activities_by_day[item.day].append(item)
-    
     # Display activities by day
+    # One markdown element per day (header plus all cards) keeps Streamlit's element count low
     for day in sorted(activities_by_day.keys()):
-        st.markdown(f"### 📅 Day {day}")
-        
-        for activity in activities_by_day[day]:
-            source_link = f" [🔗 Source]({activity.source})" if activity.source else ""
-            cost_display = f"{activity.approx_cost:.2f} {activity.currency}" if activity.approx_cost > 0 else "Free"
-            
-            st.markdown(f"""
-            <div class="activity-card">
-                <h4>{activity.activity}</h4>
-                <p><strong>Cost:</strong> {cost_display}{source_link}</p>
-            </div>
-            """, unsafe_allow_html=True)
+        cards = "".join(_activity_card_html(activity) for activity in activities_by_day[day])
+        st.markdown(f"### 📅 Day {day}\n\n{cards}", unsafe_allow_html=True)
     
     # Notes
     if plan.notes:
@@ -181,14 +197,6 @@ def main():
     """Main Streamlit application."""
     initialize_session_state()
     
-    # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🌊 Travel Assistant</h1>
-        <p>Reliable Agent Demo - Building Reliable Workflows with LangChain</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
     # Sidebar for inputs
     with st.sidebar:
         st.header("🎯 Trip Planning")
@@ -230,7 +238,7 @@ def main():
         
         # Clear logs button
         if st.button("🗑️ Clear Logs"):
-            st.session_state.logs = []
+            st.session_state.logs.clear()
             st.rerun()
     
     with col1:
@@ -328,8 +336,11 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
+            # Group activities once for both the itinerary view and the text export
+            activities_by_day = _group_by_day(plan.items)
+            
             # Display the itinerary
-            display_itinerary(plan)
+            display_itinerary(plan, activities_by_day)
             
             # Export options
             st.markdown("### 📤 Export Options")
@@ -355,12 +366,6 @@ Status: {'Under Budget' if plan.under_budget else 'Over Budget'}
 
 Itinerary:
 """
-                activities_by_day = {}
-                for item in plan.items:
-                    if item.day not in activities_by_day:
-                        activities_by_day[item.day] = []
-                    activities_by_day[item.day].append(item)
-                
                 for day in sorted(activities_by_day.keys()):
                     text_export += f"\nDay {day}:\n"
                     for activity in activities_by_day[day]:
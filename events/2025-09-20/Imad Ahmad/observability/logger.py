@@ -1,26 +1,73 @@
 import structlog
 import logging
 import json
+import hashlib
+import itertools
+import numbers
 import sqlite3
+import queue
+import secrets
+import threading
+import time
 import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize log data to a JSON string, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str)
+
+
+def _json_renderer() -> structlog.processors.JSONRenderer:
+    if orjson is not None:
+        return structlog.processors.JSONRenderer(serializer=lambda obj, **kw: orjson.dumps(obj, **kw).decode())
+    return structlog.processors.JSONRenderer()
+
+
+# Standard LogRecord attributes, excluded from the extra_data column
+_LOGRECORD_SKIP_KEYS = frozenset({
+    'name', 'msg', 'args', 'levelname', 'levelno', 'pathname',
+    'filename', 'module', 'lineno', 'funcName', 'created',
+    'msecs', 'relativeCreated', 'thread', 'threadName',
+    'processName', 'process', 'getMessage', 'exc_info',
+    'exc_text', 'stack_info', 'message'
+})
+
 
 class DatabaseHandler(logging.Handler):
-    """Custom logging handler that stores logs in SQLite database."""
+    """Custom logging handler that stores logs in SQLite database.
+    
+    Records are queued by emit() and written in batches by a background thread.
+    """
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, batch_size: int = 256, flush_interval: float = 0.5):
         super().__init__()
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
         self._init_db()
+        
+        self._writer = threading.Thread(target=self._flush_loop, name="log-db-writer", daemon=True)
+        self._writer.start()
     
     def _init_db(self):
         """Initialize the database with required tables."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # WAL lets the writer thread and trace inserts proceed without blocking readers
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -51,26 +98,13 @@ class DatabaseHandler(logging.Handler):
         conn.close()
     
     def emit(self, record):
-        """Emit a log record to the database."""
+        """Queue a log record for the background database writer."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Extract structured data from the record
-            extra_data = {}
-            for key, value in record.__dict__.items():
-                if key not in ['name', 'msg', 'args', 'levelname', 'levelno', 'pathname', 
-                              'filename', 'module', 'lineno', 'funcName', 'created', 
-                              'msecs', 'relativeCreated', 'thread', 'threadName', 
-                              'processName', 'process', 'getMessage', 'exc_info', 
-                              'exc_text', 'stack_info']:
-                    extra_data[key] = value
+            extra_data = {key: value for key, value in record.__dict__.items()
+                          if key not in _LOGRECORD_SKIP_KEYS}
             
-            cursor.execute("""
-                INSERT INTO logs (timestamp, level, message, request_id, tool_name, 
-                                duration_ms, inputs_hash, output_size, status, extra_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            self._queue.put((
                 datetime.fromtimestamp(record.created).isoformat(),
                 record.levelname,
                 record.getMessage(),
@@ -80,18 +114,81 @@ class DatabaseHandler(logging.Handler):
                 getattr(record, 'inputs_hash', None),
                 getattr(record, 'output_size', None),
                 getattr(record, 'status', None),
-                json.dumps(extra_data) if extra_data else None
+                _dumps(extra_data) if extra_data else None
             ))
-            
-            conn.commit()
-            conn.close()
         except Exception as e:
             print(f"Failed to log to database: {e}")
+    
+    def _flush_loop(self):
+        """Drain queued records and insert them in batches until close() is called."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        
+        running = True
+        while running:
+            # Block for the first record, then collect more until the batch is full or the interval passes
+            batch = []
+            row = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while row is not None:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if row is None:
+                running = False
+            
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany("""
+                            INSERT INTO logs (timestamp, level, message, request_id, tool_name, 
+                                            duration_ms, inputs_hash, output_size, status, extra_data)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, batch)
+                except Exception as e:
+                    print(f"Failed to log to database: {e}")
+        
+        conn.close()
+    
+    def close(self):
+        """Flush pending records and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        super().close()
+
+
+DEFAULT_DB_PATH = "data/travel_assistant.db"
 
+_setup_lock = threading.Lock()
+_setup_logger: Optional[structlog.stdlib.BoundLogger] = None
+# Database used by get_db_connection; follows the db_path given to setup_logger
+_db_path = DEFAULT_DB_PATH
 
-def setup_logger(db_path: str = "data/travel_assistant.db") -> structlog.stdlib.BoundLogger:
-    """Set up structured logging with database storage."""
+
+def setup_logger(db_path: str = DEFAULT_DB_PATH) -> structlog.stdlib.BoundLogger:
+    """Set up structured logging with database storage.
+    
+    Safe to call from every module: configuration happens once and later calls
+    return the same logger.
+    """
+    global _setup_logger, _db_path
     
+    with _setup_lock:
+        if _setup_logger is None:
+            _db_path = db_path
+            _setup_logger = _configure_logging(db_path)
+    return _setup_logger
+
+
+def _configure_logging(db_path: str) -> structlog.stdlib.BoundLogger:
     # Ensure data directory exists
     Path(db_path).parent.mkdir(exist_ok=True)
     
@@ -106,7 +203,7 @@ def setup_logger(db_path: str = "data/travel_assistant.db") -> structlog.stdlib.
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
             structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
+            _json_renderer()
         ],
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
@@ -121,20 +218,37 @@ def setup_logger(db_path: str = "data/travel_assistant.db") -> structlog.stdlib.
         level=logging.INFO,
     )
     
-    # Add database handler
+    # Add database handler, unless one is already attached (e.g. after a module reload)
     logger = logging.getLogger()
-    db_handler = DatabaseHandler(db_path)
-    logger.addHandler(db_handler)
+    if not any(isinstance(h, DatabaseHandler) for h in logger.handlers):
+        logger.addHandler(DatabaseHandler(db_path))
     
     return structlog.get_logger()
 
 
+# Request ids: a random per-process prefix plus a counter, instead of a uuid4 per call
+_REQUEST_ID_PREFIX = secrets.token_hex(8)
+_request_counter = itertools.count()
+
+
+def new_request_id() -> str:
+    """Return a process-unique id for correlating a tool call with its result."""
+    return f"{_REQUEST_ID_PREFIX}-{next(_request_counter):x}"
+
+
+def _hash_inputs(inputs: Dict[str, Any]) -> str:
+    """Short digest of tool inputs, stable across processes unlike the salted built-in hash()."""
+    # Compact sorted JSON is the canonical form; the stdlib encoder keeps it identical with or without orjson
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
 def log_tool_call(logger: structlog.stdlib.BoundLogger, 
                   tool_name: str, 
                   inputs: Dict[str, Any], 
                   request_id: str) -> str:
     """Log the start of a tool call."""
-    inputs_hash = str(hash(str(sorted(inputs.items()))))
+    inputs_hash = _hash_inputs(inputs)
     
     logger.info(
         "Tool call started",
@@ -147,15 +261,39 @@ def log_tool_call(logger: structlog.stdlib.BoundLogger,
     return inputs_hash
 
 
+def _output_size(result: Any) -> int:
+    """Approximate a result's size without rendering large objects to a throwaway string."""
+    if not result:
+        return 0
+    if isinstance(result, numbers.Number):
+        return 8
+    if isinstance(result, (str, bytes)):
+        return len(result)
+    if isinstance(result, (list, tuple)):
+        return sum(_output_size(item) for item in result)
+    if hasattr(result, 'model_dump_json'):
+        return len(result.model_dump_json())
+    return len(str(result))
+
+
 def log_tool_result(logger: structlog.stdlib.BoundLogger,
                    tool_name: str,
                    inputs_hash: str,
                    result: Any,
                    duration_ms: int,
                    request_id: str,
-                   success: bool = True):
-    """Log the result of a tool call."""
-    output_size = len(str(result)) if result else 0
+                   success: bool = True,
+                   result_args: tuple = ()):
+    """Log the result of a tool call.
+    
+    ``result`` may be a %-format string with ``result_args``; it is only formatted
+    when INFO logging is enabled.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if result_args:
+        result = result % result_args
+    output_size = _output_size(result)
     status = "succeeded" if success else "failed"
     
     logger.info(
@@ -169,18 +307,33 @@ def log_tool_result(logger: structlog.stdlib.BoundLogger,
     )
 
 
+_db_local = threading.local()
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """Return this thread's autocommit connection to the app database, opening it on first use.
+    
+    The database is the one setup_logger was configured with, so logs, traces and
+    caches share a file.
+    """
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        Path(_db_path).parent.mkdir(exist_ok=True)
+        conn = sqlite3.connect(_db_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _db_local.conn = conn
+    return conn
+
+
 def log_trace(logger: structlog.stdlib.BoundLogger,
               request_id: str,
               event_type: str,
               data: Dict[str, Any]):
     """Log a trace event."""
     # Also store in traces table
-    db_path = "data/travel_assistant.db"
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        get_db_connection().execute("""
             INSERT INTO traces (request_id, timestamp, event_type, data)
             VALUES (?, ?, ?, ?)
         """, (
@@ -189,9 +342,6 @@ def log_trace(logger: structlog.stdlib.BoundLogger,
             event_type,
             json.dumps(data)
         ))
-        
-        conn.commit()
-        conn.close()
     except Exception as e:
         logger.error("Failed to store trace", error=str(e))
     
@@ -1,15 +1,201 @@
 import os
 import json
-from typing import Dict, Any, List
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+import httpx
 from openai import OpenAI
-from agent.schemas import ItineraryPlan
+from agent.schemas import ItineraryPlan, ItineraryItem
 from agent.reliability import reliable_service_call
-from observability.logger import setup_logger, log_tool_call, log_tool_result
+from observability.logger import setup_logger, log_tool_call, log_tool_result, new_request_id, get_db_connection
 import time
-import uuid
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib decoder
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
 
 logger = setup_logger()
 
+# System prompt for itinerary generation, filled in per request with str.format_map
+_ITINERARY_SYSTEM_TEMPLATE = """You are a travel planning assistant. Create a detailed {days}-day itinerary for {destination} 
+with a budget of {budget_amount} {budget_currency}.
+
+CRITICAL REQUIREMENTS:
+- MUST create activities for ALL {days} days (Day 1, Day 2, Day 3, etc.)
+- Each day should have 2-3 activities minimum
+- Distribute budget evenly across all {days} days
+- Extract ACTUAL prices from the search results provided
+- Use REAL URLs from search results as sources
+- If search results show "AED 169" or "$45", use those exact prices
+- Convert currencies accurately using the currency tool if needed
+- Stay within budget (allow 5% headroom)
+- Prioritize activities with confirmed pricing from search results
+- Include the actual source URL from search results, not placeholder URLs
+
+DAY DISTRIBUTION REQUIREMENTS:
+- Day 1: Arrival activities, major attractions
+- Day 2: Cultural experiences, local exploration
+- Day 3: Shopping, departure activities
+- Continue pattern for additional days
+- Include mix of paid and free activities on each day
+
+PRICING EXTRACTION INSTRUCTIONS:
+- Look for price patterns like "AED 169", "$45", "from $30", "starting at 25 USD"
+- Extract the numerical value and currency from search snippets
+- Use the exact URL provided in the search result as the source
+- If no price is found in search results, estimate conservatively
+- Budget per day should be approximately {budget_per_day:.2f} {budget_currency}
+
+Budget constraint: Total cost must not exceed {budget_limit} {budget_currency}
+"""
+
+# Function schema for structured itinerary output
+_ITINERARY_FUNCTION_SCHEMA = {
+    "name": "create_itinerary",
+    "description": "Create a structured travel itinerary",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "destination": {"type": "string"},
+            "days": {"type": "integer"},
+            "total_estimated_cost": {"type": "number"},
+            "currency": {"type": "string"},
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "day": {"type": "integer"},
+                        "activity": {"type": "string"},
+                        "approx_cost": {"type": "number"},
+                        "currency": {"type": "string"},
+                        "source": {"type": "string", "description": "URL source if available"}
+                    },
+                    "required": ["day", "activity", "approx_cost", "currency"]
+                }
+            },
+            "under_budget": {"type": "boolean"},
+            "notes": {"type": "string"}
+        },
+        "required": ["destination", "days", "total_estimated_cost", "currency", "items", "under_budget", "notes"]
+    }
+}
+
+# Request arguments that never change between itinerary calls
+_ITINERARY_FUNCTIONS = [_ITINERARY_FUNCTION_SCHEMA]
+_ITINERARY_FUNCTION_CALL = {"name": _ITINERARY_FUNCTION_SCHEMA["name"]}
+
+# Keep-alive pool for OpenAI requests; sized for concurrent planning and compression calls
+_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=60)
+
+# Opt-in: set ITINERARY_SKIP_VALIDATION=1 to build plans from function-call output without
+# Pydantic validation. Unvalidated plans are never written to the itinerary cache.
+ITINERARY_SKIP_VALIDATION = os.getenv("ITINERARY_SKIP_VALIDATION", "").lower() in ("1", "true", "yes")
+
+
+def _build_itinerary(data: Dict[str, Any]) -> ItineraryPlan:
+    """Build an ItineraryPlan from function-call output.
+    
+    The model can still return missing or mistyped fields, so the data is validated
+    unless ITINERARY_SKIP_VALIDATION is set.
+    """
+    if not ITINERARY_SKIP_VALIDATION:
+        return ItineraryPlan.model_validate(data)
+    items = [ItineraryItem.model_construct(**item) for item in data.get("items", [])]
+    return ItineraryPlan.model_construct(**{**data, "items": items})
+
+
+# Histories shorter than this are kept verbatim; a summary would not be meaningfully smaller
+COMPRESS_MIN_CHARS = 400
+
+# Concurrent generate_itinerary calls per batch; kept under typical per-key RPM limits,
+# with 429s handled by the per-call retry backoff
+ITINERARY_BATCH_MAX_WORKERS = 4
+
+# Maximum number of generated itineraries kept in the SQLite itinerary_cache table
+ITINERARY_CACHE_MAX_ENTRIES = 256
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _itinerary_cache_key(model: str, destination: str, days: int, budget_amount: float,
+                         budget_currency: str, search_results: List[Dict[str, Any]],
+                         context: str) -> str:
+    """Content address for a generate_itinerary call: a digest of its model and normalized inputs.
+
+    Casing, whitespace and search result order do not change the plan, so requests that
+    differ only in those share a cache entry.
+    """
+    results = sorted(
+        (_normalize_text(str(r.get("url", ""))), _normalize_text(str(r.get("title", ""))),
+         _normalize_text(str(r.get("snippet", ""))))
+        for r in search_results
+    )
+    payload = json.dumps({
+        "model": model,
+        "destination": _normalize_text(destination),
+        "days": days,
+        "budget_amount": round(float(budget_amount), 2),
+        "budget_currency": budget_currency.strip().upper(),
+        "search_results": results,
+        "context": _normalize_text(context),
+    }, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+_cache_table_ready = False
+
+
+def _itinerary_cache_db():
+    """Return the app database connection, creating the itinerary_cache table on first use."""
+    global _cache_table_ready
+    conn = get_db_connection()
+    if not _cache_table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS itinerary_cache (
+                key TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                plan_json TEXT NOT NULL
+            )
+        """)
+        _cache_table_ready = True
+    return conn
+
+
+def _load_cached_itinerary(key: str) -> Optional[ItineraryPlan]:
+    try:
+        row = _itinerary_cache_db().execute(
+            "SELECT plan_json FROM itinerary_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return ItineraryPlan.model_validate_json(row[0]) if row else None
+    except Exception as e:
+        logger.warning("Failed to read itinerary cache", error=str(e))
+        return None
+
+
+def _store_cached_itinerary(key: str, plan: ItineraryPlan):
+    try:
+        conn = _itinerary_cache_db()
+        conn.execute(
+            "INSERT OR REPLACE INTO itinerary_cache (key, created_at, plan_json) VALUES (?, ?, ?)",
+            (key, datetime.now().isoformat(), plan.model_dump_json())
+        )
+        # Keep the cache bounded by evicting the oldest entries
+        conn.execute(
+            "DELETE FROM itinerary_cache WHERE key NOT IN "
+            "(SELECT key FROM itinerary_cache ORDER BY created_at DESC LIMIT ?)",
+            (ITINERARY_CACHE_MAX_ENTRIES,)
+        )
+    except Exception as e:
+        logger.warning("Failed to write itinerary cache", error=str(e))
+
 
 class OpenAIClient:
     """Wrapper for OpenAI API with function calling and safe decoding."""
@@ -21,7 +207,13 @@ class OpenAIClient:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # Retries come from reliable_service_call; with SDK retries off, each call (and the
+        # reliability worker running it) is bounded by the per-request timeout
+        self.client = OpenAI(
+            api_key=self.api_key,
+            http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=httpx.Timeout(30, connect=5)),
+            max_retries=0
+        )
     
     @reliable_service_call("openai", timeout=30, retries=2)
     def generate_itinerary(self, 
@@ -32,7 +224,7 @@ class OpenAIClient:
                           search_results: List[Dict[str, Any]] = None,
                           context: str = "") -> ItineraryPlan:
         """Generate travel itinerary using OpenAI function calling."""
-        request_id = str(uuid.uuid4())
+        request_id = new_request_id()
         start_time = time.time()
         
         inputs = {
@@ -45,89 +237,51 @@ class OpenAIClient:
         inputs_hash = log_tool_call(logger, "openai_generate_itinerary", inputs, request_id)
         
         try:
+            # Equivalent requests (same normalized inputs, search results and context) reuse the stored plan
+            cache_key = _itinerary_cache_key(
+                self.model,
+                destination=destination,
+                days=days,
+                budget_amount=budget_amount,
+                budget_currency=budget_currency,
+                search_results=search_results or [],
+                context=context
+            )
+            cached_plan = _load_cached_itinerary(cache_key)
+            if cached_plan is not None:
+                duration_ms = int((time.time() - start_time) * 1000)
+                log_tool_result(logger, "openai_generate_itinerary", inputs_hash, 
+                              "Cache hit: %d activities", duration_ms, request_id, True,
+                              result_args=(len(cached_plan.items),))
+                return cached_plan
+            
             # Prepare system message
-            system_message = f"""You are a travel planning assistant. Create a detailed {days}-day itinerary for {destination} 
-            with a budget of {budget_amount} {budget_currency}.
-
-            CRITICAL REQUIREMENTS:
-            - MUST create activities for ALL {days} days (Day 1, Day 2, Day 3, etc.)
-            - Each day should have 2-3 activities minimum
-            - Distribute budget evenly across all {days} days
-            - Extract ACTUAL prices from the search results provided
-            - Use REAL URLs from search results as sources
-            - If search results show "AED 169" or "$45", use those exact prices
-            - Convert currencies accurately using the currency tool if needed
-            - Stay within budget (allow 5% headroom)
-            - Prioritize activities with confirmed pricing from search results
-            - Include the actual source URL from search results, not placeholder URLs
-            
-            DAY DISTRIBUTION REQUIREMENTS:
-            - Day 1: Arrival activities, major attractions
-            - Day 2: Cultural experiences, local exploration
-            - Day 3: Shopping, departure activities
-            - Continue pattern for additional days
-            - Include mix of paid and free activities on each day
-            
-            PRICING EXTRACTION INSTRUCTIONS:
-            - Look for price patterns like "AED 169", "$45", "from $30", "starting at 25 USD"
-            - Extract the numerical value and currency from search snippets
-            - Use the exact URL provided in the search result as the source
-            - If no price is found in search results, estimate conservatively
-            - Budget per day should be approximately {budget_amount / days:.2f} {budget_currency}
-            
-            Budget constraint: Total cost must not exceed {budget_amount * 1.05} {budget_currency}
-            """
+            system_message = _ITINERARY_SYSTEM_TEMPLATE.format_map({
+                "destination": destination,
+                "days": days,
+                "budget_amount": budget_amount,
+                "budget_currency": budget_currency,
+                "budget_per_day": budget_amount / days,
+                "budget_limit": budget_amount * 1.05
+            })
             
             # Prepare user message with search context
-            user_message = f"Plan a {days}-day trip to {destination} with budget {budget_amount} {budget_currency}."
+            parts = [f"Plan a {days}-day trip to {destination} with budget {budget_amount} {budget_currency}."]
             
             if search_results:
-                search_context = "\n\nAvailable pricing information from search (USE THESE EXACT PRICES AND URLS):\n"
-                for i, result in enumerate(search_results[:15], 1):  # More results for better pricing
-                    title = result.get('title', '')
-                    snippet = result.get('snippet', '')
-                    url = result.get('url', '')
-                    search_context += f"{i}. TITLE: {title}\n"
-                    search_context += f"   PRICE INFO: {snippet}\n"
-                    search_context += f"   SOURCE URL: {url}\n\n"
-                user_message += search_context
-                
-                user_message += f"\nIMPORTANT: Extract exact prices from the snippets above and use the corresponding URLs as sources. Look for patterns like 'AED 169', '$45', 'from 30 USD', etc.\n\nREMINDER: You MUST create activities for ALL {days} days. Do not create only 1 day of activities."
+                parts.append("\n\nAvailable pricing information from search (USE THESE EXACT PRICES AND URLS):\n")
+                parts.extend(
+                    f"{i}. TITLE: {result.get('title', '')}\n"
+                    f"   PRICE INFO: {result.get('snippet', '')}\n"
+                    f"   SOURCE URL: {result.get('url', '')}\n\n"
+                    for i, result in enumerate(search_results[:15], 1)  # More results for better pricing
+                )
+                parts.append(f"\nIMPORTANT: Extract exact prices from the snippets above and use the corresponding URLs as sources. Look for patterns like 'AED 169', '$45', 'from 30 USD', etc.\n\nREMINDER: You MUST create activities for ALL {days} days. Do not create only 1 day of activities.")
             
             if context:
-                user_message += f"\n\nAdditional context: {context}"
+                parts.append(f"\n\nAdditional context: {context}")
             
-            # Define function schema for structured output
-            function_schema = {
-                "name": "create_itinerary",
-                "description": "Create a structured travel itinerary",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "destination": {"type": "string"},
-                        "days": {"type": "integer"},
-                        "total_estimated_cost": {"type": "number"},
-                        "currency": {"type": "string"},
-                        "items": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "day": {"type": "integer"},
-                                    "activity": {"type": "string"},
-                                    "approx_cost": {"type": "number"},
-                                    "currency": {"type": "string"},
-                                    "source": {"type": "string", "description": "URL source if available"}
-                                },
-                                "required": ["day", "activity", "approx_cost", "currency"]
-                            }
-                        },
-                        "under_budget": {"type": "boolean"},
-                        "notes": {"type": "string"}
-                    },
-                    "required": ["destination", "days", "total_estimated_cost", "currency", "items", "under_budget", "notes"]
-                }
-            }
+            user_message = "".join(parts)
             
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -135,29 +289,32 @@ class OpenAIClient:
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": user_message}
                 ],
-                functions=[function_schema],
-                function_call={"name": "create_itinerary"},
+                functions=_ITINERARY_FUNCTIONS,
+                function_call=_ITINERARY_FUNCTION_CALL,
                 temperature=0.7,
                 timeout=30
             )
             
             # Extract function call result
             function_call = response.choices[0].message.function_call
-            if not function_call or function_call.name != "create_itinerary":
+            if not function_call or function_call.name != _ITINERARY_FUNCTION_CALL["name"]:
                 raise ValueError("OpenAI did not return expected function call")
             
             # Parse the JSON response
             try:
-                itinerary_data = json.loads(function_call.arguments)
-            except json.JSONDecodeError as e:
+                itinerary_data = _json_loads(function_call.arguments)
+            except ValueError as e:
                 raise ValueError(f"Failed to parse OpenAI response as JSON: {e}")
             
-            # Create and validate the itinerary plan
-            itinerary_plan = ItineraryPlan(**itinerary_data)
+            # Create the itinerary plan (validated unless ITINERARY_SKIP_VALIDATION is set)
+            itinerary_plan = _build_itinerary(itinerary_data)
+            if not ITINERARY_SKIP_VALIDATION:
+                _store_cached_itinerary(cache_key, itinerary_plan)
             
             duration_ms = int((time.time() - start_time) * 1000)
             log_tool_result(logger, "openai_generate_itinerary", inputs_hash, 
-                          f"Generated {len(itinerary_plan.items)} activities", duration_ms, request_id, True)
+                          "Generated %d activities", duration_ms, request_id, True,
+                          result_args=(len(itinerary_plan.items),))
             
             return itinerary_plan
             
@@ -166,38 +323,82 @@ class OpenAIClient:
             log_tool_result(logger, "openai_generate_itinerary", inputs_hash, str(e), duration_ms, request_id, False)
             raise e
     
+    def generate_itinerary_batch(self, requests: List[Dict[str, Any]]) -> List[ItineraryPlan]:
+        """Generate several itineraries concurrently, e.g. when re-planning with different days or budgets.
+        
+        Each request holds the keyword arguments of ``generate_itinerary``; plans are
+        returned in request order.
+        """
+        if not requests:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(ITINERARY_BATCH_MAX_WORKERS, len(requests))) as executor:
+            futures = [executor.submit(self.generate_itinerary, **request) for request in requests]
+            return [future.result() for future in futures]
+    
     @reliable_service_call("openai", timeout=15, retries=1)
-    def compress_context(self, conversation_history: str) -> str:
-        """Compress conversation history to a compact memo."""
-        request_id = str(uuid.uuid4())
+    def compress_context(self, conversation_history: str, prior_summary: str = "", reflect: bool = False) -> str:
+        """Compress conversation history to a compact memo.
+        
+        With ``prior_summary`` only the new turns are summarized, producing a delta to append
+        to the existing memo. With ``reflect=True`` the input is an oversized memo to restructure.
+        """
+        request_id = new_request_id()
         start_time = time.time()
         
-        inputs = {"history_length": len(conversation_history)}
+        inputs = {
+            "history_length": len(conversation_history),
+            "prior_summary_length": len(prior_summary),
+            "reflect": reflect
+        }
         inputs_hash = log_tool_call(logger, "openai_compress_context", inputs, request_id)
         
+        if not reflect and len(conversation_history) < COMPRESS_MIN_CHARS:
+            duration_ms = int((time.time() - start_time) * 1000)
+            log_tool_result(logger, "openai_compress_context", inputs_hash,
+                          "Skipped: below threshold", duration_ms, request_id, True)
+            return conversation_history.strip()
+        
         try:
-            response = self.client.chat.completions.create(
+            if reflect:
+                system_content = "Restructure the following conversation memo into a single compact memo that preserves key travel preferences, constraints, and decisions. Merge duplicates and drop superseded details. Keep it under 200 words."
+                user_content = conversation_history
+            elif prior_summary:
+                system_content = "Summarize only the new conversation turns into a compact memo addendum that preserves key travel preferences, constraints, and decisions. Do not repeat anything already in the prior summary. Keep it under 200 words."
+                user_content = f"Prior summary:\n{prior_summary}\n\nNew turns:\n{conversation_history}"
+            else:
+                system_content = "Summarize the following conversation into a compact memo that preserves key travel preferences, constraints, and decisions. Keep it under 200 words."
+                user_content = conversation_history
+            
+            # Stream the memo so tokens are read off the socket as they are generated
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {
                         "role": "system",
-                        "content": "Summarize the following conversation into a compact memo that preserves key travel preferences, constraints, and decisions. Keep it under 200 words."
+                        "content": system_content
                     },
                     {
                         "role": "user",
-                        "content": conversation_history
+                        "content": user_content
                     }
                 ],
                 temperature=0.3,
                 max_tokens=250,
-                timeout=15
+                timeout=15,
+                stream=True
             )
             
-            compressed = response.choices[0].message.content.strip()
+            chunks = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+            compressed = "".join(chunks).strip()
             
             duration_ms = int((time.time() - start_time) * 1000)
             log_tool_result(logger, "openai_compress_context", inputs_hash, 
-                          f"Compressed to {len(compressed)} chars", duration_ms, request_id, True)
+                          "Compressed to %d chars", duration_ms, request_id, True,
+                          result_args=(len(compressed),))
             
             return compressed
             
@@ -205,3 +406,9 @@ class OpenAIClient:
             duration_ms = int((time.time() - start_time) * 1000)
             log_tool_result(logger, "openai_compress_context", inputs_hash, str(e), duration_ms, request_id, False)
             raise e
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> OpenAIClient:
+    """Return the process-wide OpenAIClient shared by the agent components."""
+    return OpenAIClient()
@@ -1,14 +1,94 @@
+import json
+import math
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import threading
+from functools import lru_cache
 from typing import List, Dict, Any
 from agent.schemas import SearchResult
 from agent.reliability import reliable_service_call
-from observability.logger import setup_logger, log_tool_call, log_tool_result
+from observability.logger import setup_logger, log_tool_call, log_tool_result, new_request_id
 import time
-import uuid
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib decoder
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # simdjson is optional; organic results are then decoded in full
+    simdjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# simdjson parsers reuse their buffers and are not thread-safe, so keep one per thread
+_parser_local = threading.local()
+
+
+def _parse_organic(content: bytes, num_results: int) -> List[SearchResult]:
+    """Build SearchResults from the organic block, leaving the rest of the payload unmaterialized."""
+    if simdjson is None:
+        organic_results = _json_loads(content).get("organic", [])
+        return [
+            SearchResult(
+                title=result.get("title", ""),
+                url=result.get("link", ""),
+                snippet=result.get("snippet", "")
+            )
+            for result in organic_results[:num_results]
+        ]
+
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = _parser_local.parser = simdjson.Parser()
+    doc = parser.parse(content)
+    organic_results = doc.get("organic") or []
+    results = []
+    for i in range(min(num_results, len(organic_results))):
+        result = organic_results[i]
+        results.append(SearchResult(
+            title=str(result.get("title", "")),
+            url=str(result.get("link", "")),
+            snippet=str(result.get("snippet", ""))
+        ))
+    # Proxies into the parser's buffer go out of scope here, before its next parse
+    return results
 
 logger = setup_logger()
 
+# Per-attempt HTTP timeout (seconds) and the longest Retry-After we will sleep for
+_REQUEST_TIMEOUT = 5
+_RETRY_AFTER_MAX = 2.0
+
+
+class _CappedRetry(Retry):
+    """Retry that honours Retry-After but never sleeps longer than _RETRY_AFTER_MAX."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, _RETRY_AFTER_MAX)
+
+
+# Transient HTTP failures are retried on the pooled connection, honouring (capped) Retry-After.
+# Search is idempotent, so POST is retried too.
+_TRANSPORT_RETRY = _CappedRetry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "POST"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+# Overall search deadline: every transport attempt plus the longest sleep between attempts
+# (a capped Retry-After, which also exceeds the 0.3s-factor backoff for two retries)
+_SEARCH_DEADLINE = math.ceil(
+    (_TRANSPORT_RETRY.total + 1) * _REQUEST_TIMEOUT + _TRANSPORT_RETRY.total * _RETRY_AFTER_MAX
+)
+
 
 class SerperClient:
     """Typed client for Serper API with timeouts and retries."""
@@ -17,13 +97,18 @@ class SerperClient:
         self.api_key = os.getenv("SERPER_API_KEY")
         self.base_url = "https://google.serper.dev/search"
         
+        # Keep-alive pool so repeated searches reuse the TLS connection to Serper
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_TRANSPORT_RETRY))
+        
         if not self.api_key:
             raise ValueError("SERPER_API_KEY environment variable is required")
     
-    @reliable_service_call("search", timeout=5, retries=2)
+    # Retries happen in the transport; the decorator keeps the overall deadline, breaker and fallback
+    @reliable_service_call("search", timeout=_SEARCH_DEADLINE, retries=0)
     def search(self, query: str, num_results: int = 5) -> List[SearchResult]:
         """Search using Serper API and return structured results."""
-        request_id = str(uuid.uuid4())
+        request_id = new_request_id()
         start_time = time.time()
         
         inputs = {"query": query, "num_results": num_results}
@@ -40,27 +125,15 @@ class SerperClient:
                 "num": num_results
             }
             
-            response = requests.post(
+            response = self._session.post(
                 self.base_url,
                 headers=headers,
                 json=payload,
-                timeout=5
+                timeout=_REQUEST_TIMEOUT
             )
             
             response.raise_for_status()
-            data = response.json()
-            
-            # Parse results
-            results = []
-            organic_results = data.get("organic", [])
-            
-            for result in organic_results[:num_results]:
-                search_result = SearchResult(
-                    title=result.get("title", ""),
-                    url=result.get("link", ""),
-                    snippet=result.get("snippet", "")
-                )
-                results.append(search_result)
+            results = _parse_organic(response.content, num_results)
             
             duration_ms = int((time.time() - start_time) * 1000)
             log_tool_result(logger, "serper_search", inputs_hash, results, duration_ms, request_id, True)
@@ -71,3 +144,13 @@ class SerperClient:
             duration_ms = int((time.time() - start_time) * 1000)
             log_tool_result(logger, "serper_search", inputs_hash, str(e), duration_ms, request_id, False)
             raise e
+
+
+@lru_cache(maxsize=2)
+def _cached_serper_client(api_key: str) -> SerperClient:
+    return SerperClient()
+
+
+def get_serper_client() -> SerperClient:
+    """Return a shared SerperClient, rebuilt only when SERPER_API_KEY changes."""
+    return _cached_serper_client(os.getenv("SERPER_API_KEY"))
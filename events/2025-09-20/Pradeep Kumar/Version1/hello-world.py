@@ -1,9 +1,10 @@
 
 import os
 from dotenv import load_dotenv
-import httpx
 from openai import OpenAI
 
+from clients import shared_client
+
 
 # Load environment variables from .env file in current directory
 load_dotenv()
@@ -12,8 +13,8 @@ load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
 
-# Create an HTTPX client with SSL verification disabled
-httpx_client = httpx.Client(verify=False)
+# Shared HTTPX client with SSL verification disabled
+httpx_client = shared_client
 
 # Initialize OpenAI client with custom HTTPX client
 client = OpenAI(api_key=api_key, http_client=httpx_client)
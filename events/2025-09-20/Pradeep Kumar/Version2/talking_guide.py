@@ -2,7 +2,8 @@ import os
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
-import httpx
+
+from clients import shared_client
 
 
 # Load environment variables from .env file in project root
@@ -21,8 +22,8 @@ Guide:"""
 prompt = PromptTemplate(input_variables=["user_input"], template=template)
 
 
-# 2) Initialize the chat LLM with custom HTTPX client to disable SSL verification (not for production use)
-httpx_client = httpx.Client(verify=False)
+# 2) Initialize the chat LLM with the shared HTTPX client (SSL verification disabled, not for production use)
+httpx_client = shared_client
 llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.6, max_tokens=200, openai_api_key=api_key, http_client=httpx_client)
 
 
@@ -3,10 +3,12 @@ import os
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
-import httpx
+import tiktoken
 import sys
 import traceback
 
+from clients import shared_client
+
 # Load environment variables from .env file in project root
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
@@ -29,8 +31,8 @@ Guide:"""
 
 prompt = PromptTemplate(input_variables=["history", "user_input"], template=template)
 
-# Initialize the chat LLM with custom HTTPX client to disable SSL verification (not for production use)
-httpx_client = httpx.Client(verify=False)
+# Initialize the chat LLM with the shared HTTPX client (SSL verification disabled, not for production use)
+httpx_client = shared_client
 llm = ChatOpenAI(
     model_name="gpt-4o-mini",
     temperature=0.6,
@@ -39,20 +41,33 @@ llm = ChatOpenAI(
     http_client=httpx_client,
 )
 
-def format_history_as_text(history_list, max_turns=6):
+# Tokenizer for the chat model, used to keep the history within a token budget
+encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+
+
+def format_history_as_text(history_list, max_turns=6, max_tokens=1500):
     """
     Convert history list of (role, text) tuples into a string for the prompt.
-    We include up to `max_turns` most recent user/assistant pairs to keep prompt short.
+    We include up to `max_turns` most recent user/assistant pairs, and stop earlier
+    once the entries would exceed `max_tokens`, so long replies cannot bloat the prompt.
     """
     if not history_list:
         return "No prior conversation."
 
     # Build strings like: "User: ...\nGuide: ..."
     pairs = []
+    total_tokens = 0
     # history_list is list of dicts: {"role":"user"/"assistant", "content": "..."}
     # We'll iterate from most recent to older and collect up to max_turns entries
     trimmed = history_list[-(max_turns * 2):]  # each turn has 2 entries (user+assistant) generally
-    for entry in trimmed:
+    for entry in reversed(trimmed):
+        # Token count is cached on the entry so past turns are encoded only once
+        if "_tok" not in entry:
+            entry["_tok"] = len(encoding.encode(entry["content"]))
+        total_tokens += entry["_tok"]
+        if pairs and total_tokens > max_tokens:
+            break
+
         role = entry["role"]
         text = entry["content"].strip()
         if role == "user":
@@ -62,8 +77,8 @@ def format_history_as_text(history_list, max_turns=6):
         else:
             pairs.append(f"{role.capitalize()}: {text}")
 
-    # Show most recent first
-    return "\n".join(reversed(pairs))
+    # Already ordered most recent first
+    return "\n".join(pairs)
 
 def run_cli():
     print("=== Dubai Talking Guide — Version 3 (Memory demo) ===")
@@ -104,12 +119,12 @@ def run_cli():
 
             # response is an AIMessage-like object; get its textual content
             # Many langchain wrappers return response.content
-            assistant_text = getattr(response, "content", None) or str(response)
+            assistant_text = (getattr(response, "content", None) or str(response)).strip()
 
             # Print assistant reply and append to history
-            print("\nGuide:", assistant_text.strip(), "\n")
+            print("\nGuide:", assistant_text, "\n")
             history.append({"role": "user", "content": user_input})
-            history.append({"role": "assistant", "content": assistant_text.strip()})
+            history.append({"role": "assistant", "content": assistant_text})
 
     finally:
         # cleanup httpx client
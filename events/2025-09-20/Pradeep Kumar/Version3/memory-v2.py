@@ -3,10 +3,11 @@ import os
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
-import httpx
 import sys
 import traceback
-from langchain.memory import ConversationBufferMemory
+
+from clients import shared_client
+from langchain.memory import ConversationBufferWindowMemory
 
 # Load environment variables from .env file in project root
 load_dotenv()
@@ -28,8 +29,8 @@ Guide:"""
 
 prompt = PromptTemplate(input_variables=["history", "input"], template=template)
 
-# Initialize the chat LLM with custom HTTPX client to disable SSL verification (not for production use)
-httpx_client = httpx.Client(verify=False)
+# Initialize the chat LLM with the shared HTTPX client (SSL verification disabled, not for production use)
+httpx_client = shared_client
 llm = ChatOpenAI(
     model_name="gpt-4o-mini",
     temperature=0.6,
@@ -39,13 +40,17 @@ llm = ChatOpenAI(
 )
 
 
+# Keep only the most recent turns so the prompt size stays bounded
+MEMORY_WINDOW_TURNS = 8
+
+
 def run_cli():
-    print("=== Dubai Talking Guide — Version 3 (ConversationBufferMemory) ===")
+    print("=== Dubai Talking Guide — Version 3 (ConversationBufferWindowMemory) ===")
     print("Type your question and press Enter.")
-    print("Commands: /exit  -> quit,   /clear -> clear conversation history\n")
+    print(f"Commands: /exit  -> quit,   /clear -> clear conversation history (last {MEMORY_WINDOW_TURNS} turns are kept)\n")
 
-    # Use ConversationBufferMemory for automatic history
-    memory = ConversationBufferMemory(return_messages=True, input_key="input", memory_key="history")
+    # Use a windowed conversation memory for automatic, bounded history
+    memory = ConversationBufferWindowMemory(k=MEMORY_WINDOW_TURNS, return_messages=True, input_key="input", memory_key="history")
 
     try:
         while True:
@@ -74,11 +79,11 @@ def run_cli():
                 traceback.print_exc()
                 continue
 
-            assistant_text = getattr(response, "content", None) or str(response)
-            print("\nGuide:", assistant_text.strip(), "\n")
+            assistant_text = (getattr(response, "content", None) or str(response)).strip()
+            print("\nGuide:", assistant_text, "\n")
 
             # Save user and assistant messages to memory
-            memory.save_context({"input": user_input}, {"output": assistant_text.strip()})
+            memory.save_context({"input": user_input}, {"output": assistant_text})
 
     finally:
         try:
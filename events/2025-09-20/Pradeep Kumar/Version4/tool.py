@@ -4,7 +4,7 @@ agent_with_openweather_tool_insecure.py
 
 Demo-only version:
  - WeatherTool: calls OpenWeatherMap current weather API
- - Agent: LangChain agent (ZERO_SHOT_REACT_DESCRIPTION) that can call the tool
+ - Agent: LangChain tool-calling agent (native OpenAI function calling) that can call the tool
  - Simple CLI to interact with the agent
  - SSL verification DISABLED (insecure, for demo only)
 
@@ -16,19 +16,33 @@ Environment:
  - OPENWEATHER_API_KEY
 """
 
+import asyncio
 import os
 import sys
+import threading
 import traceback
+from collections import OrderedDict
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Dict
 import httpx
 
+try:
+    import simdjson  # optional: lazy JSON decoding of API responses
+except ImportError:
+    simdjson = None
+
+from clients import shared_client, shared_async_client
+
 # LangChain imports (BaseTool, agent utilities)
 from langchain.tools import BaseTool
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_openai import ChatOpenAI
-from langchain.agents import initialize_agent, AgentType
-from langchain.memory import ConversationBufferMemory
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.memory import ConversationBufferWindowMemory
 
 # Load env
 load_dotenv()
@@ -42,6 +56,118 @@ if not OPENWEATHER_API_KEY:
     print("ERROR: OPENWEATHER_API_KEY not set in environment.")
     sys.exit(1)
 
+# Shared session so geocoding and weather calls reuse connections to OpenWeatherMap
+# Transient failures (429/5xx, honouring Retry-After) are retried on the pooled connection
+RETRY_AFTER_MAX = 2.0  # seconds; a long Retry-After would otherwise stall the tool call
+
+
+class CappedRetry(Retry):
+    """Retry that honours Retry-After but never sleeps longer than RETRY_AFTER_MAX."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_AFTER_MAX)
+
+
+http_retry = CappedRetry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=http_retry))
+http_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=http_retry))
+
+GEO_URL = "http://api.openweathermap.org/geo/1.0/direct"
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# Pooled async client for WeatherTool._arun (SSL verification disabled, demo only)
+async_http_client = shared_async_client
+
+
+def _geo_params(location: str) -> Dict:
+    return {"q": location, "limit": 1, "appid": OPENWEATHER_API_KEY}
+
+
+def _weather_params(location: str, lat, lon) -> Dict:
+    if lat is not None and lon is not None:
+        return {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units": "metric"}
+    return {"q": location, "appid": OPENWEATHER_API_KEY, "units": "metric"}
+
+
+# simdjson parsers reuse their buffers, so keep one per thread
+_parser_local = threading.local()
+_JSON_ARRAY_TYPES = (list,) if simdjson is None else (list, simdjson.Array)
+
+
+def _decode_json(resp):
+    """Decode a response body; with simdjson, fields are only materialized when read."""
+    if simdjson is None:
+        return resp.json()
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = _parser_local.parser = simdjson.Parser()
+    return parser.parse(resp.content)
+
+
+# Geocoding results are effectively static, so keep recent lookups in-process (LRU)
+GEOCODE_CACHE_SIZE = 1024
+_geocode_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _cached_geocode(location: str):
+    key = location.strip().lower()
+    hit = _geocode_cache.get(key)
+    if hit is not None:
+        _geocode_cache.move_to_end(key)
+    return hit
+
+
+def _remember_geocode(location: str, geocode) -> None:
+    # Only resolved locations are cached; misses keep falling back to the q param
+    if geocode[0] is None:
+        return
+    _geocode_cache[location.strip().lower()] = geocode
+    if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+        _geocode_cache.popitem(last=False)
+
+
+def _parse_geocode(geo_data, location: str):
+    """Return (lat, lon, display_name) from a geocoding response."""
+    if isinstance(geo_data, _JSON_ARRAY_TYPES) and len(geo_data) > 0:
+        top = geo_data[0]
+        display_name = ", ".join(
+            filter(None, [top.get("name"), top.get("state"), top.get("country")])
+        )
+        return top.get("lat"), top.get("lon"), display_name
+    # fallback: try current weather by q param
+    return None, None, location
+
+
+def _summarize_weather(display_name: str, wdata: Dict) -> str:
+    """Build a user-friendly summary from a current-weather response."""
+    # Handle API errors
+    if wdata.get("cod") and int(wdata.get("cod")) != 200:
+        return f"OpenWeatherMap error: {wdata.get('message', 'unknown error')}"
+
+    weather_arr = wdata.get("weather", [])
+    description = weather_arr[0]["description"].capitalize() if weather_arr else "Unknown"
+    main = wdata.get("main", {})
+    temp = main.get("temp")
+    feels_like = main.get("feels_like")
+    humidity = main.get("humidity")
+    wind_speed = wdata.get("wind", {}).get("speed")
+
+    return (
+        f"Weather for {display_name}: {description}."
+        + (f" Temperature {temp}°C (feels like {feels_like}°C)." if temp is not None else "")
+        + (f" Humidity {humidity}%." if humidity is not None else "")
+        + (f" Wind {wind_speed} m/s." if wind_speed is not None else "")
+    )
+
+
 # -------------------------
 # WeatherTool: subclass BaseTool
 # -------------------------
@@ -55,74 +181,83 @@ class WeatherTool(BaseTool):
             if not location or not location.strip():
                 return "OpenWeatherMap: please provide a location (e.g., 'Dubai')."
 
-            # Try geocoding endpoint for accuracy
-            geo_url = "http://api.openweathermap.org/geo/1.0/direct"
-            geo_params = {"q": location, "limit": 1, "appid": OPENWEATHER_API_KEY}
-            geo_resp = requests.get(geo_url, params=geo_params, timeout=10, verify=False)
-            geo_resp.raise_for_status()
-            geo_data = geo_resp.json()
-            if isinstance(geo_data, list) and len(geo_data) > 0:
-                top = geo_data[0]
-                lat = top.get("lat")
-                lon = top.get("lon")
-                display_name = ", ".join(
-                    filter(None, [top.get("name"), top.get("state"), top.get("country")])
-                )
-            else:
-                # fallback: try current weather by q param
-                lat = lon = None
-                display_name = location
+            # Try geocoding endpoint for accuracy, unless this location was resolved before
+            geocode = _cached_geocode(location)
+            if geocode is None:
+                geo_resp = http_session.get(GEO_URL, params=_geo_params(location), timeout=10, verify=False)
+                geo_resp.raise_for_status()
+                geocode = _parse_geocode(_decode_json(geo_resp), location)
+                _remember_geocode(location, geocode)
+            lat, lon, display_name = geocode
 
             # Get current weather
-            if lat is not None and lon is not None:
-                weather_url = "https://api.openweathermap.org/data/2.5/weather"
-                params = {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units": "metric"}
-            else:
-                weather_url = "https://api.openweathermap.org/data/2.5/weather"
-                params = {"q": location, "appid": OPENWEATHER_API_KEY, "units": "metric"}
-
-            wresp = requests.get(weather_url, params=params, timeout=10, verify=False)
+            wresp = http_session.get(WEATHER_URL, params=_weather_params(location, lat, lon), timeout=10, verify=False)
             wresp.raise_for_status()
-            wdata = wresp.json()
-
-            # Handle API errors
-            if wdata.get("cod") and int(wdata.get("cod")) != 200:
-                return f"OpenWeatherMap error: {wdata.get('message', 'unknown error')}"
-
-            # Build a user-friendly summary
-            weather_arr = wdata.get("weather", [])
-            description = weather_arr[0]["description"].capitalize() if weather_arr else "Unknown"
-            main = wdata.get("main", {})
-            temp = main.get("temp")
-            feels_like = main.get("feels_like")
-            humidity = main.get("humidity")
-            wind_speed = wdata.get("wind", {}).get("speed")
-
-            parts = [f"Weather for {display_name}:"]
-            parts.append(f"{description}.")
-            if temp is not None:
-                parts.append(f"Temperature {temp}°C (feels like {feels_like}°C).")
-            if humidity is not None:
-                parts.append(f"Humidity {humidity}%.")
-            if wind_speed is not None:
-                parts.append(f"Wind {wind_speed} m/s.")
-
-            return " ".join(parts)
+            return _summarize_weather(display_name, _decode_json(wresp))
         except requests.HTTPError as he:
             return f"OpenWeatherMap HTTP error: {str(he)}"
         except Exception as e:
             return f"Failed to retrieve weather: {str(e)}"
 
     async def _arun(self, location: str) -> str:
-        # Async not implemented for this demo
-        raise NotImplementedError("Async _arun not implemented.")
+        """Async run on the pooled async client, so agent.ainvoke does not block on the tool."""
+        try:
+            if not location or not location.strip():
+                return "OpenWeatherMap: please provide a location (e.g., 'Dubai')."
+
+            # Weather lookup needs the geocoded lat/lon, so the two calls stay sequential
+            geocode = _cached_geocode(location)
+            if geocode is None:
+                geo_resp = await async_http_client.get(GEO_URL, params=_geo_params(location))
+                geo_resp.raise_for_status()
+                geocode = _parse_geocode(_decode_json(geo_resp), location)
+                _remember_geocode(location, geocode)
+            lat, lon, display_name = geocode
+
+            wresp = await async_http_client.get(WEATHER_URL, params=_weather_params(location, lat, lon))
+            wresp.raise_for_status()
+            return _summarize_weather(display_name, _decode_json(wresp))
+        except httpx.HTTPStatusError as he:
+            return f"OpenWeatherMap HTTP error: {str(he)}"
+        except Exception as e:
+            return f"Failed to retrieve weather: {str(e)}"
+
+
+# -------------------------
+# Loop guard: stop the agent when it repeats a tool call
+# -------------------------
+class RepeatedToolCall(Exception):
+    """Raised when the agent asks for a (tool, input) pair it already ran this turn."""
+
+
+class RepeatedToolCallGuard(BaseCallbackHandler):
+    """Per-turn callback that aborts on a duplicate tool call and keeps the last observation.
+
+    A repeated call would return the same observation and cost another LLM round-trip,
+    so the caller can answer with `last_output` instead.
+    """
+
+    raise_error = True  # let RepeatedToolCall propagate instead of being logged and ignored
+
+    def __init__(self):
+        self.seen = set()
+        self.last_output = None
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        key = (serialized.get("name"), input_str)
+        if key in self.seen:
+            raise RepeatedToolCall(key)
+        self.seen.add(key)
+
+    def on_tool_end(self, output, **kwargs):
+        self.last_output = output
 
 
 # -------------------------
 # LLM, Agent, Memory setup
 # -------------------------
-# Use httpx client with SSL verification disabled
-httpx_client = httpx.Client(verify=False, timeout=15.0)
+# Use the shared httpx clients with SSL verification disabled
+httpx_client = shared_client
 
 llm = ChatOpenAI(
     model_name="gpt-4o-mini",
@@ -130,44 +265,52 @@ llm = ChatOpenAI(
     max_tokens=512,
     openai_api_key=OPENAI_API_KEY,
     http_client=httpx_client,  # <<-- critical to avoid SSL error
+    http_async_client=shared_async_client,
 )
 
-# memory (optional): keep short context during the demo
-memory = ConversationBufferMemory(return_messages=True, input_key="input", memory_key="history")
+# memory (optional): keep short context during the demo, bounded to the last few turns
+MEMORY_WINDOW_TURNS = 8
+memory = ConversationBufferWindowMemory(k=MEMORY_WINDOW_TURNS, return_messages=True, input_key="input", memory_key="history")
+
+# Static agent instructions. The system message comes first and the user input last,
+# so every request starts with the same bytes and OpenAI's automatic prompt caching
+# can reuse that prefix across turns. Keep per-turn data (history, timestamps) out of it.
+# No Thought/Action/Action Input format rules: the tool-calling agent uses the model's
+# native function calling, so there is no ReAct text for LangChain to regex-parse.
+AGENT_SYSTEM_PROMPT = (
+    "You are a helpful Dubai guide agent. "
+    "Use the weather tool for current weather questions; otherwise answer directly."
+)
+
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", AGENT_SYSTEM_PROMPT),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
 
 # initialize agent with our WeatherTool
 tools = [WeatherTool()]
 
-agent = initialize_agent(
+agent = AgentExecutor(
+    agent=create_tool_calling_agent(llm, tools, AGENT_PROMPT),
     tools=tools,
-    llm=llm,
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
     verbose=True,      # show chain / tool calls in console
     max_iterations=3,  # safety: limit tool-call loops
-    agent_kwargs={
-        "prefix": (
-            "You are a helpful Dubai guide agent. "
-            "Always answer in the following format:\n"
-            "Thought: [your reasoning]\n"
-            "Action: [the action to take, or 'Final Answer']\n"
-            "Action Input: [the input to the action, or your answer]\n"
-            "If you don't need to use a tool, respond with 'Final Answer' as the Action."
-        )
-    }
 )
 
 
 # -------------------------
-# Simple CLI for demo
+# Simple CLI for demo (async: the agent awaits the LLM and WeatherTool._arun)
 # -------------------------
-def run_cli():
+async def run_cli():
     print("=== Dubai Guide Agent (with OpenWeatherMap tool) ===")
     print("Ask normal questions (e.g., 'Tell me about Dubai') or weather ones ('What's the weather in Dubai?').")
-    print("Commands: /exit, /clear\n")
+    print(f"Commands: /exit, /clear (memory keeps the last {MEMORY_WINDOW_TURNS} turns)\n")
 
     try:
         while True:
-            user_input = input("You: ").strip()
+            # input() blocks, so read it off the event loop thread
+            user_input = (await asyncio.to_thread(input, "You: ")).strip()
             if not user_input:
                 continue
             if user_input.lower() in ("/exit", "/quit"):
@@ -181,9 +324,18 @@ def run_cli():
 
 
             try:
-                # Use agent.invoke (run is deprecated), pass input as dict, handle parsing errors
-                result = agent.invoke({"input": user_input}, handle_parsing_errors=True)
+                # Use agent.ainvoke (run is deprecated), pass input as dict
+                guard = RepeatedToolCallGuard()
+                result = await agent.ainvoke({"input": user_input}, config={"callbacks": [guard]})
                 answer = result["output"] if isinstance(result, dict) and "output" in result else str(result)
+            except RepeatedToolCall:
+                # The agent is looping on the same tool call; its last observation is the answer.
+                # The duplicate can arrive before any call finished (parallel calls, or the first
+                # one failed), in which case there is nothing to answer with.
+                if guard.last_output is None:
+                    print("Agent stopped: it repeated the same tool call without getting a result. Please try rephrasing.\n")
+                    continue
+                answer = str(guard.last_output)
             except Exception as e:
                 print("Agent error:", str(e))
                 traceback.print_exc()
@@ -196,9 +348,11 @@ def run_cli():
     finally:
         try:
             httpx_client.close()
+            http_session.close()
+            await shared_async_client.aclose()
         except Exception:
             pass
 
 
 if __name__ == "__main__":
-    run_cli()
+    asyncio.run(run_cli())
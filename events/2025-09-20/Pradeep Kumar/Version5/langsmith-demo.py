@@ -17,26 +17,43 @@ Environment:
  - OPENWEATHER_API_KEY
  - LANGSMITH_API_KEY      # <--- add this to enable tracing
  - LANGSMITH_PROJECT_NAME # optional (defaults to your LangSmith workspace/project)
+ - DEMO_TRACING           # optional; set to "false" to switch this demo's tracer off entirely
+ - LANGSMITH_SAMPLE_RATE  # optional; fraction of agent runs to trace (default 0.01, "1" traces every run)
 """
 
 import os
 
+import asyncio
+import random
 import ssl
 ssl._create_default_https_context = ssl._create_unverified_context
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 import sys
+import threading
 import traceback
+from collections import OrderedDict
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Dict
 import httpx
 
+try:
+    import simdjson  # optional: lazy JSON decoding of API responses
+except ImportError:
+    simdjson = None
+
+from clients import shared_client, shared_async_client
+
 # LangChain imports (BaseTool, agent utilities)
 from langchain.tools import BaseTool
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_openai import ChatOpenAI
-from langchain.agents import initialize_agent, AgentType
-from langchain.memory import ConversationBufferMemory
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.memory import ConversationBufferWindowMemory
 
 # LangSmith / tracing imports
 # Note: langchain's tracer implementation lives under langchain_core.tracers.langchain
@@ -54,6 +71,15 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 LANGSMITH_API_KEY = os.getenv("LANGSMITH_API_KEY")             # required to send traces
 LANGSMITH_PROJECT_NAME = os.getenv("LANGSMITH_PROJECT_NAME")   # optional project name
+# On/off switch for this demo's tracer: when false no tracer, client or background export
+# queue is created. (LANGSMITH_TRACING is LangChain's own global "trace everything" switch.)
+DEMO_TRACING = os.getenv("DEMO_TRACING", "true").lower() == "true"
+# LangChain's env-based tracing would attach its own tracer to every run, tracing unsampled
+# runs and uploading sampled ones twice; the per-run tracer below is the only one we want.
+for _var in ("LANGSMITH_TRACING", "LANGSMITH_TRACING_V2", "LANGCHAIN_TRACING_V2", "LANGCHAIN_TRACING"):
+    os.environ.pop(_var, None)
+# Head sampling: only this fraction of agent runs gets the tracer attached at all
+LANGSMITH_SAMPLE_RATE = float(os.getenv("LANGSMITH_SAMPLE_RATE", "0.01"))
 
 if not OPENAI_API_KEY:
     print("ERROR: OPENAI_API_KEY not set in environment.")
@@ -66,18 +92,135 @@ if not OPENWEATHER_API_KEY:
 # OPTIONAL: initialize LangSmith (tracing)
 # -------------------------
 tracer = None
-if LANGSMITH_API_KEY and LangSmithClient is not None and LangChainTracer is not None:
-    # create LangSmith client (you can pass api_url for eu/self-hosted)
+if not DEMO_TRACING:
+    print("DEMO_TRACING is false; LangSmith tracing disabled.")
+elif LANGSMITH_API_KEY and LangSmithClient is not None and LangChainTracer is not None:
+    # create LangSmith client (you can pass api_url for eu/self-hosted).
+    # The client batches runs and uploads them from a background thread by default;
+    # run_cli flushes that queue on exit.
     client = LangSmithClient(api_key=LANGSMITH_API_KEY)
     # create a LangChainTracer that will send runs to LangSmith project
     tracer = LangChainTracer(project_name=LANGSMITH_PROJECT_NAME, client=client)
-    print("LangSmith tracing enabled (project:", LANGSMITH_PROJECT_NAME or "default", ")")
+    print("LangSmith tracing enabled (project:", LANGSMITH_PROJECT_NAME or "default",
+          f", sampling {LANGSMITH_SAMPLE_RATE:.0%} of runs)")
 else:
     if LANGSMITH_API_KEY and (LangSmithClient is None or LangChainTracer is None):
         print("LangSmith package or tracer not available. Install 'langsmith' and ensure compatible langchain packages.")
     else:
         print("LANGSMITH_API_KEY not set; LangSmith tracing disabled.")
 
+# Shared session so geocoding and weather calls reuse connections to OpenWeatherMap
+# Transient failures (429/5xx, honouring Retry-After) are retried on the pooled connection
+RETRY_AFTER_MAX = 2.0  # seconds; a long Retry-After would otherwise stall the tool call
+
+
+class CappedRetry(Retry):
+    """Retry that honours Retry-After but never sleeps longer than RETRY_AFTER_MAX."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_AFTER_MAX)
+
+
+http_retry = CappedRetry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=http_retry))
+http_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=http_retry))
+
+GEO_URL = "http://api.openweathermap.org/geo/1.0/direct"
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# Pooled async client for WeatherTool._arun (SSL verification disabled, demo only)
+async_http_client = shared_async_client
+
+
+def _geo_params(location: str) -> Dict:
+    return {"q": location, "limit": 1, "appid": OPENWEATHER_API_KEY}
+
+
+def _weather_params(location: str, lat, lon) -> Dict:
+    if lat is not None and lon is not None:
+        return {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units": "metric"}
+    return {"q": location, "appid": OPENWEATHER_API_KEY, "units": "metric"}
+
+
+# simdjson parsers reuse their buffers, so keep one per thread
+_parser_local = threading.local()
+_JSON_ARRAY_TYPES = (list,) if simdjson is None else (list, simdjson.Array)
+
+
+def _decode_json(resp):
+    """Decode a response body; with simdjson, fields are only materialized when read."""
+    if simdjson is None:
+        return resp.json()
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = _parser_local.parser = simdjson.Parser()
+    return parser.parse(resp.content)
+
+
+# Geocoding results are effectively static, so keep recent lookups in-process (LRU)
+GEOCODE_CACHE_SIZE = 1024
+_geocode_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _cached_geocode(location: str):
+    key = location.strip().lower()
+    hit = _geocode_cache.get(key)
+    if hit is not None:
+        _geocode_cache.move_to_end(key)
+    return hit
+
+
+def _remember_geocode(location: str, geocode) -> None:
+    # Only resolved locations are cached; misses keep falling back to the q param
+    if geocode[0] is None:
+        return
+    _geocode_cache[location.strip().lower()] = geocode
+    if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+        _geocode_cache.popitem(last=False)
+
+
+def _parse_geocode(geo_data, location: str):
+    """Return (lat, lon, display_name) from a geocoding response."""
+    if isinstance(geo_data, _JSON_ARRAY_TYPES) and len(geo_data) > 0:
+        top = geo_data[0]
+        display_name = ", ".join(
+            filter(None, [top.get("name"), top.get("state"), top.get("country")])
+        )
+        return top.get("lat"), top.get("lon"), display_name
+    # fallback: try current weather by q param
+    return None, None, location
+
+
+def _summarize_weather(display_name: str, wdata: Dict) -> str:
+    """Build a user-friendly summary from a current-weather response."""
+    # Handle API errors
+    if wdata.get("cod") and int(wdata.get("cod")) != 200:
+        return f"OpenWeatherMap error: {wdata.get('message', 'unknown error')}"
+
+    weather_arr = wdata.get("weather", [])
+    description = weather_arr[0]["description"].capitalize() if weather_arr else "Unknown"
+    main = wdata.get("main", {})
+    temp = main.get("temp")
+    feels_like = main.get("feels_like")
+    humidity = main.get("humidity")
+    wind_speed = wdata.get("wind", {}).get("speed")
+
+    return (
+        f"Weather for {display_name}: {description}."
+        + (f" Temperature {temp}°C (feels like {feels_like}°C)." if temp is not None else "")
+        + (f" Humidity {humidity}%." if humidity is not None else "")
+        + (f" Wind {wind_speed} m/s." if wind_speed is not None else "")
+    )
+
+
 # -------------------------
 # WeatherTool: subclass BaseTool
 # -------------------------
@@ -91,77 +234,83 @@ class WeatherTool(BaseTool):
             if not location or not location.strip():
                 return "OpenWeatherMap: please provide a location (e.g., 'Dubai')."
 
-            # Try geocoding endpoint for accuracy
-            geo_url = "http://api.openweathermap.org/geo/1.0/direct"
-            geo_params = {"q": location, "limit": 1, "appid": OPENWEATHER_API_KEY}
-            geo_resp = requests.get(geo_url, params=geo_params, timeout=10, verify=False)
-            geo_resp.raise_for_status()
-            geo_data = geo_resp.json()
-            if isinstance(geo_data, list) and len(geo_data) > 0:
-                top = geo_data[0]
-                lat = top.get("lat")
-                lon = top.get("lon")
-                display_name = ", ".join(
-                    filter(None, [top.get("name"), top.get("state"), top.get("country")])
-                )
-            else:
-                # fallback: try current weather by q param
-                lat = lon = None
-                display_name = location
+            # Try geocoding endpoint for accuracy, unless this location was resolved before
+            geocode = _cached_geocode(location)
+            if geocode is None:
+                geo_resp = http_session.get(GEO_URL, params=_geo_params(location), timeout=10, verify=False)
+                geo_resp.raise_for_status()
+                geocode = _parse_geocode(_decode_json(geo_resp), location)
+                _remember_geocode(location, geocode)
+            lat, lon, display_name = geocode
 
             # Get current weather
-            if lat is not None and lon is not None:
-                weather_url = "https://api.openweathermap.org/data/2.5/weather"
-                params = {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units": "metric"}
-            else:
-                weather_url = "https://api.openweathermap.org/data/2.5/weather"
-                params = {"q": location, "appid": OPENWEATHER_API_KEY, "units": "metric"}
-
-            wresp = requests.get(weather_url, params=params, timeout=10, verify=False)
+            wresp = http_session.get(WEATHER_URL, params=_weather_params(location, lat, lon), timeout=10, verify=False)
             wresp.raise_for_status()
-            wdata = wresp.json()
-
-            # Handle API errors
-            if wdata.get("cod") and int(wdata.get("cod")) != 200:
-                return f"OpenWeatherMap error: {wdata.get('message', 'unknown error')}"
-
-            # Build a user-friendly summary
-            weather_arr = wdata.get("weather", [])
-            description = weather_arr[0]["description"].capitalize() if weather_arr else "Unknown"
-            main = wdata.get("main", {})
-            temp = main.get("temp")
-            feels_like = main.get("feels_like")
-            humidity = main.get("humidity")
-            wind_speed = wdata.get("wind", {}).get("speed")
-
-            parts = [f"Weather for {display_name}:"]
-            parts.append(f"{description}.")
-            if temp is not None:
-                parts.append(f"Temperature {temp}°C (feels like {feels_like}°C).")
-            if humidity is not None:
-                parts.append(f"Humidity {humidity}%.")
-            if wind_speed is not None:
-                parts.append(f"Wind {wind_speed} m/s.")
-
-            return " ".join(parts)
+            return _summarize_weather(display_name, _decode_json(wresp))
         except requests.HTTPError as he:
             return f"OpenWeatherMap HTTP error: {str(he)}"
         except Exception as e:
             return f"Failed to retrieve weather: {str(e)}"
 
     async def _arun(self, location: str) -> str:
-        # Async not implemented for this demo
-        raise NotImplementedError("Async _arun not implemented.")
+        """Async run on the pooled async client, so agent.ainvoke does not block on the tool."""
+        try:
+            if not location or not location.strip():
+                return "OpenWeatherMap: please provide a location (e.g., 'Dubai')."
+
+            # Weather lookup needs the geocoded lat/lon, so the two calls stay sequential
+            geocode = _cached_geocode(location)
+            if geocode is None:
+                geo_resp = await async_http_client.get(GEO_URL, params=_geo_params(location))
+                geo_resp.raise_for_status()
+                geocode = _parse_geocode(_decode_json(geo_resp), location)
+                _remember_geocode(location, geocode)
+            lat, lon, display_name = geocode
+
+            wresp = await async_http_client.get(WEATHER_URL, params=_weather_params(location, lat, lon))
+            wresp.raise_for_status()
+            return _summarize_weather(display_name, _decode_json(wresp))
+        except httpx.HTTPStatusError as he:
+            return f"OpenWeatherMap HTTP error: {str(he)}"
+        except Exception as e:
+            return f"Failed to retrieve weather: {str(e)}"
 
 
 # -------------------------
-# LLM, Agent, Memory setup
+# Loop guard: stop the agent when it repeats a tool call
 # -------------------------
-# Use httpx client with SSL verification disabled
-httpx_client = httpx.Client(verify=False, timeout=15.0)
+class RepeatedToolCall(Exception):
+    """Raised when the agent asks for a (tool, input) pair it already ran this turn."""
+
 
-# Attach tracer as a callback to the LLM if tracer is available
-llm_callbacks = [tracer] if tracer is not None else None
+class RepeatedToolCallGuard(BaseCallbackHandler):
+    """Per-turn callback that aborts on a duplicate tool call and keeps the last observation.
+
+    A repeated call would return the same observation and cost another LLM round-trip,
+    so the caller can answer with `last_output` instead.
+    """
+
+    raise_error = True  # let RepeatedToolCall propagate instead of being logged and ignored
+
+    def __init__(self):
+        self.seen = set()
+        self.last_output = None
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        key = (serialized.get("name"), input_str)
+        if key in self.seen:
+            raise RepeatedToolCall(key)
+        self.seen.add(key)
+
+    def on_tool_end(self, output, **kwargs):
+        self.last_output = output
+
+
+# -------------------------
+# LLM, Agent, Memory setup
+# -------------------------
+# Use the shared httpx clients with SSL verification disabled
+httpx_client = shared_client
 
 llm = ChatOpenAI(
     model_name="gpt-4o-mini",
@@ -169,45 +318,52 @@ llm = ChatOpenAI(
     max_tokens=512,
     openai_api_key=OPENAI_API_KEY,
     http_client=httpx_client,  # <<-- critical to avoid SSL error
-    callbacks=llm_callbacks,   # <-- attach LangSmith tracer (if present)
+    http_async_client=shared_async_client,
+)
+
+# memory (optional): keep short context during the demo, bounded to the last few turns
+MEMORY_WINDOW_TURNS = 8
+memory = ConversationBufferWindowMemory(k=MEMORY_WINDOW_TURNS, return_messages=True, input_key="input", memory_key="history")
+
+# Static agent instructions. The system message comes first and the user input last,
+# so every request starts with the same bytes and OpenAI's automatic prompt caching
+# can reuse that prefix across turns. Keep per-turn data (history, timestamps) out of it.
+# The tool-calling agent uses the model's native function calling, so there is no
+# Thought/Action text to parse (and no parse-error retries to trace).
+AGENT_SYSTEM_PROMPT = (
+    "You are a helpful Dubai guide agent. "
+    "Use the weather tool for current weather questions; otherwise answer directly."
 )
 
-# memory (optional): keep short context during the demo
-memory = ConversationBufferMemory(return_messages=True, input_key="input", memory_key="history")
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", AGENT_SYSTEM_PROMPT),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
 
 # initialize agent with our WeatherTool
 tools = [WeatherTool()]
 
-agent = initialize_agent(
+agent = AgentExecutor(
+    agent=create_tool_calling_agent(llm, tools, AGENT_PROMPT),
     tools=tools,
-    llm=llm,
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
     verbose=True,      # show chain / tool calls in console
     max_iterations=3,  # safety: limit tool-call loops
-    agent_kwargs={
-        "prefix": (
-            "You are a helpful Dubai guide agent. "
-            "Always answer in the following format:\n"
-            "Thought: [your reasoning]\n"
-            "Action: [the action to take, or 'Final Answer']\n"
-            "Action Input: [the input to the action, or your answer]\n"
-            "If you don't need to use a tool, respond with 'Final Answer' as the Action."
-        )
-    }
 )
 
 
 # -------------------------
-# Simple CLI for demo
+# Simple CLI for demo (async, streams model tokens as they arrive)
 # -------------------------
-def run_cli():
+async def run_cli():
     print("=== Dubai Guide Agent (with OpenWeatherMap tool) ===")
     print("Ask normal questions (e.g., 'Tell me about Dubai') or weather ones ('What's the weather in Dubai?').")
-    print("Commands: /exit, /clear\n")
+    print(f"Commands: /exit, /clear (memory keeps the last {MEMORY_WINDOW_TURNS} turns)\n")
 
     try:
         while True:
-            user_input = input("You: ").strip()
+            # input() blocks, so read it off the event loop thread
+            user_input = (await asyncio.to_thread(input, "You: ")).strip()
             if not user_input:
                 continue
             if user_input.lower() in ("/exit", "/quit"):
@@ -219,20 +375,38 @@ def run_cli():
                 continue
 
             try:
-                # include tracer as callback when invoking the agent (safer for v2/v3 differences)
-                invoke_kwargs = {"input": user_input}
-                if tracer is not None:
-                    # pass callbacks explicitly to ensure tracing is attached to the run
-                    result = agent.invoke(invoke_kwargs, handle_parsing_errors=True, callbacks=[tracer])
-                else:
-                    result = agent.invoke(invoke_kwargs, handle_parsing_errors=True)
-
-                answer = result["output"] if isinstance(result, dict) and "output" in result else str(result)
+                # attach the tracer once, on the run config; child runs (LLM, tool) inherit it.
+                # The sampling decision is made per agent run, so a sampled trace is always
+                # complete and unsampled runs pay no tracing cost.
+                sampled = tracer is not None and random.random() < LANGSMITH_SAMPLE_RATE
+                guard = RepeatedToolCallGuard()
+                config = {"callbacks": [guard, tracer] if sampled else [guard]}
+                answer = None
+                print("\nGuide (streaming): ", end="", flush=True)
+                async for ev in agent.astream_events({"input": user_input}, config=config, version="v2"):
+                    if ev["event"] == "on_chat_model_stream":
+                        print(ev["data"]["chunk"].content, end="", flush=True)
+                    elif ev["event"] == "on_chain_end" and not ev.get("parent_ids"):
+                        # End of the top-level agent run carries the final answer
+                        result = ev["data"].get("output")
+                        answer = result["output"] if isinstance(result, dict) and "output" in result else str(result)
+                print()
+            except RepeatedToolCall:
+                print()
+                # The agent is looping on the same tool call; its last observation is the answer.
+                # The duplicate can arrive before any call finished (parallel calls, or the first
+                # one failed), in which case there is nothing to answer with.
+                if guard.last_output is None:
+                    print("Agent stopped: it repeated the same tool call without getting a result. Please try rephrasing.\n")
+                    continue
+                answer = str(guard.last_output)
             except Exception as e:
                 print("Agent error:", str(e))
                 traceback.print_exc()
                 continue
 
+            if answer is None:
+                continue
             print("\nGuide:", answer, "\n")
             # Save to memory for short-term demo recall
             memory.save_context({"input": user_input}, {"output": answer})
@@ -240,9 +414,18 @@ def run_cli():
     finally:
         try:
             httpx_client.close()
+            http_session.close()
+            await shared_async_client.aclose()
         except Exception:
             pass
+        # flush traces still queued on our LangSmith client before exiting
+        # (wait_for_all_tracers would only flush LangChain's global client)
+        if tracer is not None:
+            try:
+                await asyncio.to_thread(tracer.client.flush)
+            except Exception:
+                pass
 
 
 if __name__ == "__main__":
-    run_cli()
+    asyncio.run(run_cli())
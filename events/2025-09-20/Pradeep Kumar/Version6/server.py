@@ -1,12 +1,15 @@
 
+import json
 import os
 from dotenv import load_dotenv
-import httpx
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from langserve import add_routes
-from langchain.prompts import ChatPromptTemplate
+from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
 from langchain_openai import ChatOpenAI
 
+from clients import shared_client, shared_async_client
+
 # Load environment variables from .env file in current directory
 load_dotenv()
 
@@ -17,22 +20,41 @@ os.environ["REQUESTS_CA_BUNDLE"] = ""
 
 # Patch both sync and async HTTPX client creators in langchain_openai to use verify=False
 import langchain_openai.chat_models.base as openai_base
+# Both return the shared, pooled clients rather than a new client per model
 def patched_get_httpx_client(*args, **kwargs):
-    return httpx.Client(verify=False)
+    return shared_client
 def patched_get_async_httpx_client(*args, **kwargs):
-    return httpx.AsyncClient(verify=False)
+    return shared_async_client
 openai_base._get_httpx_client = patched_get_httpx_client
 openai_base._get_async_httpx_client = patched_get_async_httpx_client
 
 app = FastAPI()
 
-# Define the prompt and model
-prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a helpful tour guide."),
-    ("user", "{input}")
-])
+# Define the prompt and model. The message templates are parsed once here,
+# so a request only interpolates {input}.
+_SYSTEM = SystemMessagePromptTemplate.from_template("You are a helpful tour guide.")
+_HUMAN = HumanMessagePromptTemplate.from_template("{input}")
+prompt = ChatPromptTemplate(messages=[_SYSTEM, _HUMAN])
 model = ChatOpenAI(model="gpt-4o-mini")
-chain = prompt | model
+# Config is bound once on the chain rather than per request
+chain = (prompt | model).with_config({"run_name": "guide"})
 
 # Add a /guide endpoint
-add_routes(app, chain, path="/guide")
\ No newline at end of file
+add_routes(app, chain, path="/guide")
+
+
+# GET Server-Sent Events endpoint (EventSource-friendly): tokens are sent as they are generated.
+# LangServe's own /guide/stream route is POST, so the two do not clash.
+@app.get("/guide/stream")
+async def guide_stream(input: str):
+    async def gen():
+        async for ev in chain.astream_events({"input": input}, version="v2"):
+            if ev["event"] == "on_chat_model_stream":
+                yield f"data: {json.dumps({'token': ev['data']['chunk'].content})}\n\n"
+        yield "data: {\"done\": true}\n\n"
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+clients.py
+
+Shared HTTP clients for the demo scripts. Each script imports these instead of
+building its own httpx client, so every OpenAI / LangChain call in a process goes
+through one tuned connection pool.
+
+SSL verification is DISABLED (insecure, for demo only), as in the scripts themselves.
+HTTP/2 (via the 'h2' package from httpx[http2] in requirements.txt) multiplexes
+concurrent LLM / tool calls over one connection; without h2 the clients fall back to HTTP/1.1.
+"""
+
+import importlib.util
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60.0)
+TIMEOUT = httpx.Timeout(15.0)
+
+shared_client = httpx.Client(verify=False, http2=HTTP2_AVAILABLE, limits=LIMITS, timeout=TIMEOUT)
+shared_async_client = httpx.AsyncClient(verify=False, http2=HTTP2_AVAILABLE, limits=LIMITS, timeout=TIMEOUT)
@@ -1,87 +1,126 @@
 import asyncio
+import io
 import os
+import sys
+import time
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from mcp_use import MCPAgent, MCPClient
 
+# Dict fields that commonly carry streamed text, checked in order
+CONTENT_KEYS = ("content", "messages", "text", "token", "delta")
+
+# Streamed text is buffered and written out on a newline or every FLUSH_INTERVAL
+# seconds, instead of one write + flush syscall per token
+FLUSH_INTERVAL = 0.05
+_BUF = []
+_last_flush = time.monotonic()
+
+
+def write_buffered(text):
+    """Queue streamed text, flushing to stdout on a newline or after FLUSH_INTERVAL."""
+    _BUF.append(text)
+    if "\n" in text or time.monotonic() - _last_flush > FLUSH_INTERVAL:
+        flush_buffered()
+
+
+def flush_buffered():
+    """Write out any queued text and flush stdout."""
+    global _last_flush
+    if _BUF:
+        sys.stdout.write("".join(_BUF))
+        _BUF.clear()
+    sys.stdout.flush()
+    _last_flush = time.monotonic()
+
+
+def _emit_str(chunk, emit_text):
+    # Direct strings
+    emit_text(chunk)
+
+
+def _emit_dict(chunk, emit_text):
+    # Common fields
+    for key in CONTENT_KEYS:
+        val = chunk.get(key)
+        if isinstance(val, str):
+            emit_text(val)
+            return
+    # Sometimes the content is nested (e.g., {'message_log': [AIMessageChunk(...)]})
+    msg_log = chunk.get("message_log") or chunk.get("messages")
+    if isinstance(msg_log, (list, tuple)):
+        for msg in msg_log:
+            if hasattr(msg, "content") and isinstance(msg.content, str):
+                emit_text(msg.content)
+    log_field = chunk.get("log")
+    if isinstance(log_field, str):
+        emit_text(log_field)
+
+
+def _emit_tuple(chunk, emit_text):
+    # Tuple-shaped chunks (e.g., (token, meta))
+    for el in chunk:
+        if isinstance(el, str):
+            emit_text(el)
+        elif hasattr(el, "content") and isinstance(getattr(el, "content"), str):
+            emit_text(el.content)
+
+
+# Chunk type -> handler: one dict lookup per chunk instead of an isinstance ladder
+HANDLERS = {str: _emit_str, dict: _emit_dict, tuple: _emit_tuple}
+
+
 async def main():
     load_dotenv()
     client = MCPClient.from_config_file("mcpServers.json")
     llm = ChatOpenAI(model="gpt-4.1")
     agent = MCPAgent(llm=llm, client=client, max_steps=30)
 
-    collected = []
+    collected = io.StringIO()
 
+    def emit_text(text):
+        if text:
+            collected.write(text)
+            write_buffered(text)
+
+    last_chunk = None
     async for chunk in agent.stream("What is the present price of Tesla stock?"):
+        last_chunk = chunk
         # Extract printable text robustly from different chunk shapes
-        def emit_text(text):
-            if text:
-                collected.append(text)
-                print(text, end="", flush=True)
-
         try:
-            # Direct strings
-            if isinstance(chunk, str):
-                emit_text(chunk)
-                continue
-
-            # Dict-shaped chunks
-            if isinstance(chunk, dict):
-                # Common fields
-                for key in ("content", "messages", "text", "token", "delta"):
-                    val = chunk.get(key)
-                    if isinstance(val, str):
-                        emit_text(val)
-                        break
-                else:
-                    # Sometimes the content is nested (e.g., {'message_log': [AIMessageChunk(...)]})
-                    msg_log = chunk.get("message_log") or chunk.get("messages")
-                    if isinstance(msg_log, (list, tuple)):
-                        for msg in msg_log:
-                            if hasattr(msg, "content") and isinstance(msg.content, str):
-                                emit_text(msg.content)
-                    log_field = chunk.get("log")
-                    if isinstance(log_field, str):
-                        emit_text(log_field)
-                continue
-
-            # Tuple-shaped chunks (e.g., (token, meta))
-            if isinstance(chunk, tuple):
-                for el in chunk:
-                    if isinstance(el, str):
-                        emit_text(el)
-                    elif hasattr(el, "content") and isinstance(getattr(el, "content"), str):
-                        emit_text(el.content)
-                continue
-
+            handler = HANDLERS.get(type(chunk))
+            if handler is not None:
+                handler(chunk, emit_text)
             # Objects with a 'content' attr (e.g., LangChain Message/Chunk)
-            if hasattr(chunk, "content") and isinstance(getattr(chunk, "content"), str):
+            elif isinstance(getattr(chunk, "content", None), str):
                 emit_text(chunk.content)
-                continue
         except Exception as e:
             # Don't crash on unexpected shapes; emit a minimal notice once
-            if not collected:
+            if not collected.tell():
+                # Write out buffered text first so the notice keeps its place in the stream
+                flush_buffered()
                 print(f"[stream parsing error: {e}]\n", flush=True)
+    flush_buffered()
 
-    # If nothing was streamed, fall back to a single-shot invoke
-    if not collected:
-        try:
-            result = await agent.ainvoke("What is the present price of Tesla stock?")
-            # Handle common result shapes
-            if isinstance(result, str):
-                print(result)
-            elif isinstance(result, dict):
-                out = result.get("output") or result.get("content") or result.get("text")
-                if isinstance(out, str):
-                    print(out)
-                else:
-                    print(str(result))
-            elif hasattr(result, "content") and isinstance(getattr(result, "content"), str):
-                print(result.content)
+    # If no text was extracted, show the stream's final chunk (it carries the final result)
+    # instead of re-running the whole query with ainvoke
+    if not collected.tell():
+        result = last_chunk
+        # Handle common result shapes
+        if result is None:
+            print("[no output streamed]")
+        elif isinstance(result, str):
+            print(result)
+        elif isinstance(result, dict):
+            out = result.get("output") or result.get("content") or result.get("text")
+            if isinstance(out, str):
+                print(out)
             else:
                 print(str(result))
-        except Exception as e:
-            print(f"[fallback invoke failed: {e}]")
+        elif hasattr(result, "content") and isinstance(getattr(result, "content"), str):
+            print(result.content)
+        else:
+            print(str(result))
     else:
         print()  # final newline after stream completes when we did stream something
 
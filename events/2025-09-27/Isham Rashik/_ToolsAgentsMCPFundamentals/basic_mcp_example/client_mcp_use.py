@@ -1,8 +1,34 @@
 import asyncio
 import os
+import sys
+import time
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from mcp_use import MCPAgent, MCPClient
+from mcp_servers import load_servers
+
+# Streamed text is buffered and written out on a newline or every FLUSH_INTERVAL
+# seconds, instead of one write + flush syscall per token
+FLUSH_INTERVAL = 0.05
+_BUF = []
+_last_flush = time.monotonic()
+
+
+def write_buffered(text):
+    """Queue streamed text, flushing to stdout on a newline or after FLUSH_INTERVAL."""
+    _BUF.append(text)
+    if "\n" in text or time.monotonic() - _last_flush > FLUSH_INTERVAL:
+        flush_buffered()
+
+
+def flush_buffered():
+    """Write out any queued text and flush stdout."""
+    global _last_flush
+    if _BUF:
+        sys.stdout.write("".join(_BUF))
+        _BUF.clear()
+    sys.stdout.flush()
+    _last_flush = time.monotonic()
 
 def extract_text(chunk):
     """Extract text content from various chunk formats."""
@@ -25,24 +51,31 @@ def extract_text(chunk):
 async def main():
     # Initialize environment and MCP components
     load_dotenv()
-    client = MCPClient.from_config_file("mcpServers.json")
+    client = MCPClient.from_dict({"mcpServers": load_servers()})
     llm = ChatOpenAI(model="gpt-4.1")
     agent = MCPAgent(llm=llm, client=client, max_steps=30)
     
     # Query for Tesla stock price
     query = "Count the words and characters in this text: 'The quick brown fox jumps over the lazy dog.'"
     
+    streamed = False
     try:
         # Stream the response and print chunks as they arrive
         async for chunk in agent.stream(query):
             text = extract_text(chunk)
             if text:
-                print(text, end="", flush=True)
+                streamed = True
+                write_buffered(text)
+        flush_buffered()
         print()  # Add newline after streaming completes
         
     except Exception as e:
-        # If streaming fails, try a direct invoke
+        flush_buffered()
         print(f"Streaming failed: {e}")
+        # Re-running the query would repeat output that was already printed
+        if streamed:
+            return
+        # If streaming failed before producing anything, try a direct invoke
         try:
             result = await agent.ainvoke(query)
             text = extract_text(result) or str(result)
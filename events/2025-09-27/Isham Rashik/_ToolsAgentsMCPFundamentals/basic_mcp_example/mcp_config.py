@@ -0,0 +1,30 @@
+# Shared MCP client helpers for the client examples.
+# The MCP client and discovered tools are cached at module level and rebuilt only when
+# mcpServers.json changes, so a long-running process lists tools once per config.
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp_servers import load_servers
+
+_client = None
+_client_servers = None  # load_servers() result the client was built from
+_tools = None
+_tools_client = None  # client the tools were discovered from
+
+
+def get_client():
+    """Return the shared MultiServerMCPClient, rebuilt when mcpServers.json changes."""
+    global _client, _client_servers
+    servers = load_servers()
+    if _client is None or servers is not _client_servers:
+        _client = MultiServerMCPClient(servers)
+        _client_servers = servers
+    return _client
+
+
+async def get_tools_cached():
+    """Return the tools exposed by the MCP servers, rediscovered only when the client changes."""
+    global _tools, _tools_client
+    client = get_client()
+    if _tools is None or client is not _tools_client:
+        _tools = await client.get_tools()
+        _tools_client = client
+    return _tools
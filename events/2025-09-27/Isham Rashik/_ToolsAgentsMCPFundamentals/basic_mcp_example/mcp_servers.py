@@ -0,0 +1,26 @@
+# Reads the "mcpServers" section of mcpServers.json for the client examples.
+# Kept free of MCP client imports, so scripts that only need the config stay light.
+import os
+from functools import lru_cache
+
+try:
+    import orjson as _json  # faster parsing; optional
+except ImportError:
+    import json as _json
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcpServers.json")
+
+
+@lru_cache(maxsize=1)
+def _read_servers(mtime_ns):
+    with open(CONFIG_PATH, 'rb') as f:
+        return _json.loads(f.read())["mcpServers"]
+
+
+def load_servers():
+    """Return the "mcpServers" section of mcpServers.json, re-read only when the file changes.
+
+    The same dict is returned until the file's mtime changes, so callers can compare
+    it by identity to tell whether the config was reloaded.
+    """
+    return _read_servers(os.stat(CONFIG_PATH).st_mtime_ns)
@@ -1,7 +1,21 @@
+import re
+from functools import lru_cache
 from fastmcp import FastMCP
 
 mcp = FastMCP("Demo 🚀")
 
+_WORD_RE = re.compile(r"\S+")
+
+
+# MCP clients (one per agent session) often call the tool with the same text, so counts
+# are cached across requests for the life of the server process
+@lru_cache(maxsize=128)
+def _count(text: str) -> tuple:
+    """Counts backing the word_counter tool, as an immutable tuple so cache hits stay intact."""
+    # Count matches without materialising a list of words
+    word_count = sum(1 for _ in _WORD_RE.finditer(text))
+    return word_count, len(text), len(text) - text.count(" ") - text.count("\t") - text.count("\n")
+
 @mcp.tool
 def word_counter(text: str) -> dict:
     """Count the number of words and characters in a text.
@@ -12,11 +26,11 @@ def word_counter(text: str) -> dict:
     Returns:
         A dictionary with word count and character count
     """
-    words = text.split()
+    word_count, character_count, character_count_no_spaces = _count(text)
     return {
-        "word_count": len(words),
-        "character_count": len(text),
-        "character_count_no_spaces": len(text.replace(" ", ""))
+        "word_count": word_count,
+        "character_count": character_count,
+        "character_count_no_spaces": character_count_no_spaces
     }
 
 if __name__ == "__main__":
@@ -11,7 +11,7 @@ def count_words_and_chars(text):
     char_count = len(text)
     
     # Count characters without spaces
-    char_count_no_spaces = len(text.replace(" ", ""))
+    char_count_no_spaces = len(text) - text.count(" ")
     
     return {
         "word_count": word_count,
@@ -1,22 +1,17 @@
 # MCP Client example demonstrating word counter tool
 import asyncio
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
-import json
+from mcp_config import get_tools_cached
 from dotenv import load_dotenv
 load_dotenv()
 
 async def main():
     # Initialize MCP client with word counter server
     print("Initializing MCP client...")
-    with open('mcpServers.json', 'r') as f:
-        mcp_servers = json.load(f)
     
-    client = MultiServerMCPClient(mcp_servers["mcpServers"])
-    
-    # Get tools from the MCP server
-    tools = await client.get_tools()
+    # Get tools from the MCP server (config, client and tools are cached in mcp_config)
+    tools = await get_tools_cached()
     
     print("Available tools from MCP server:")
     for tool in tools:
@@ -0,0 +1,14 @@
+"""
+Shared LLM factory for the agent demos.
+Chat models are cached per (model, temperature), so building several agents in one
+process reuses a single ChatOpenAI instance and its HTTP connection pool.
+"""
+
+from functools import lru_cache
+from langchain_openai import ChatOpenAI
+
+
+@lru_cache(maxsize=4)
+def get_llm(model: str = "gpt-4o-mini", temperature: float = 0) -> ChatOpenAI:
+    """Return the shared ChatOpenAI instance for this model and temperature."""
+    return ChatOpenAI(model=model, temperature=temperature)
@@ -9,11 +9,15 @@ ReAct (Reasoning and Acting) agents follow a structured approach:
 4. Repeat until task is complete
 """
 
+import asyncio
+import sys
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
+from text_stats import count_text
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain import hub
+from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
+from llm_factory import get_llm
 
 # Load environment variables
 load_dotenv()
@@ -29,27 +33,56 @@ def word_counter(text: str) -> dict:
     Returns:
         A dictionary with word count and character count
     """
-    words = text.split()
+    word_count, character_count, character_count_no_spaces = count_text(text)
     return {
-        "word_count": len(words),
-        "character_count": len(text),
-        "character_count_no_spaces": len(text.replace(" ", ""))
+        "word_count": word_count,
+        "character_count": character_count,
+        "character_count_no_spaces": character_count_no_spaces
     }
 
 
+# Local copy of the hwchase17/react prompt, used when the hub is unreachable
+REACT_TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+
+# Get the ReAct prompt from LangChain hub once, at import, instead of on every agent creation
+# This prompt includes the ReAct format: Thought, Action, Action Input, Observation
+try:
+    REACT_PROMPT = hub.pull("hwchase17/react")
+except Exception:
+    REACT_PROMPT = PromptTemplate.from_template(REACT_TEMPLATE)
+
+
 # Create the ReAct agent
 def create_react_agent_demo():
     """Create a ReAct agent with the word_counter tool."""
     
     # Initialize the LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_llm("gpt-4o-mini", temperature=0)
     
     # Define our tools
     tools = [word_counter]
     
-    # Get the ReAct prompt from LangChain hub
-    # This prompt includes the ReAct format: Thought, Action, Action Input, Observation
-    prompt = hub.pull("hwchase17/react")
+    # ReAct prompt (pulled from LangChain hub at import)
+    prompt = REACT_PROMPT
     
     # Create the ReAct agent
     agent = create_react_agent(llm, tools, prompt)
@@ -66,10 +99,7 @@ def create_react_agent_demo():
 
 
 # Demonstration
-if __name__ == "__main__":
-    print("=== ReAct Agent Demo ===")
-    print("Watch how the agent thinks through each step!\n")
-    
+async def _demo():
     # Create the agent
     agent = create_react_agent_demo()
     
@@ -80,12 +110,26 @@ if __name__ == "__main__":
         "Count the characters in 'Hello, World!'",
     ]
     
-    # Run examples
+    # Stream each example so the Thought/Action text shows up as the model writes it
     for query in examples:
         print(f"\nQuery: {query}")
         print("-" * 50)
-        result = agent.invoke({"input": query})
-        print(f"\nResult: {result['output']}")
+        output = None
+        async for ev in agent.astream_events({"input": query}, version="v2"):
+            if ev["event"] == "on_chat_model_stream":
+                sys.stdout.write(ev["data"]["chunk"].content)
+                sys.stdout.flush()
+            elif ev["event"] == "on_chain_end" and not ev.get("parent_ids"):
+                # End of the top-level executor run carries the final answer
+                output = ev["data"]["output"]["output"]
+        print(f"\n\nResult: {output}")
         print("=" * 60)
+
+
+if __name__ == "__main__":
+    print("=== ReAct Agent Demo ===")
+    print("Watch how the agent thinks through each step!\n")
+    
+    asyncio.run(_demo())
     
     print("\n✨ Notice how the agent follows the Thought -> Action -> Observation pattern!")
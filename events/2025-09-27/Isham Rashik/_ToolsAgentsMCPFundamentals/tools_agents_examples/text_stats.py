@@ -0,0 +1,18 @@
+"""
+Shared text counting for the word_counter tool demos.
+Counts are cached per text, so agents that analyse the same sample text repeatedly
+skip the scan; results are immutable tuples, so a cache hit cannot be altered.
+"""
+
+import re
+from functools import lru_cache
+
+_WORD_RE = re.compile(r"\S+")
+
+
+@lru_cache(maxsize=128)
+def count_text(text: str) -> tuple:
+    """Return (word count, character count, character count excluding spaces, tabs and newlines)."""
+    # Count matches without materialising a list of words
+    word_count = sum(1 for _ in _WORD_RE.finditer(text))
+    return word_count, len(text), len(text) - text.count(" ") - text.count("\t") - text.count("\n")
@@ -4,6 +4,7 @@ This script demonstrates how to create and use simple tools in LangChain
 """
 
 from langchain_core.tools import tool
+from text_stats import count_text
 from typing import Union
 from dotenv import load_dotenv
 load_dotenv()
@@ -19,11 +20,11 @@ def word_counter(text: str) -> dict:
     Returns:
         A dictionary with word count and character count
     """
-    words = text.split()
+    word_count, character_count, character_count_no_spaces = count_text(text)
     return {
-        "word_count": len(words),
-        "character_count": len(text),
-        "character_count_no_spaces": len(text.replace(" ", ""))
+        "word_count": word_count,
+        "character_count": character_count,
+        "character_count_no_spaces": character_count_no_spaces
     }
 
 
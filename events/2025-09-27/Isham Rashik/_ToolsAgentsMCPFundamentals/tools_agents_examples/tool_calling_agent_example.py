@@ -3,11 +3,13 @@ Simple Tool Calling Agent Demo
 This script demonstrates how to create a basic agent that uses the word_counter tool
 """
 
+import asyncio
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
+from text_stats import count_text
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from dotenv import load_dotenv
+from llm_factory import get_llm
 
 # Load environment variables
 load_dotenv()
@@ -23,30 +25,34 @@ def word_counter(text: str) -> dict:
     Returns:
         A dictionary with word count and character count
     """
-    words = text.split()
+    word_count, character_count, character_count_no_spaces = count_text(text)
     return {
-        "word_count": len(words),
-        "character_count": len(text),
-        "character_count_no_spaces": len(text.replace(" ", ""))
+        "word_count": word_count,
+        "character_count": character_count,
+        "character_count_no_spaces": character_count_no_spaces
     }
 
 
+# Create the prompt once; it is the same for every agent
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful assistant that can analyze text using the word_counter tool."),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+
+
 # Create the agent
 def create_simple_agent():
     """Create a simple tool-calling agent with the word_counter tool."""
     
     # Initialize the LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_llm("gpt-4o-mini", temperature=0)
     
     # Define our tools
     tools = [word_counter]
     
-    # Create the prompt
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant that can analyze text using the word_counter tool."),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+    # Use the prompt built once at import
+    prompt = AGENT_PROMPT
     
     # Create the agent
     agent = create_tool_calling_agent(llm, tools, prompt)
@@ -75,10 +81,10 @@ if __name__ == "__main__":
         "Count the characters in 'Hello, World!'",
     ]
     
-    # Run examples
-    for query in examples:
+    # Run examples concurrently, then print each query with its result
+    results = asyncio.run(agent.abatch([{"input": query} for query in examples]))
+    for query, result in zip(examples, results):
         print(f"\nQuery: {query}")
         print("-" * 50)
-        result = agent.invoke({"input": query})
         print(f"\nResult: {result['output']}")
         print("=" * 60)